@@ -1,5 +1,5 @@
 from pydantic import BaseModel , ConfigDict
-from typing import List
+from typing import List, Optional
 
 class CartItemCreate(BaseModel):
     product_id: str
@@ -9,6 +9,8 @@ class CartItemOut(BaseModel):
     id: str
     product_id: str
     name: str
+    price: Optional[float] = None
+    image_url: Optional[str] = None
     quantity: int
 
     model_config = ConfigDict(from_attributes=True)
@@ -22,3 +24,11 @@ class CartOut(BaseModel):
     items: List[CartItemOut]
 
     model_config = ConfigDict(from_attributes=True)
+
+class CartItemResult(BaseModel):
+    product_id: str
+    status: str  # "ok", "invalid_id", "not_found" or "invalid_quantity"
+
+class CartBulkOut(BaseModel):
+    cart: CartOut
+    results: List[CartItemResult]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict,Field
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 class OrderCreate(BaseModel):
@@ -14,4 +14,29 @@ class OrderOut(BaseModel):
     status: str
     created_at: datetime = Field(default_factory=datetime.now)
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class OrderItemOut(BaseModel):
+    product_id: str
+    quantity: int
+    unit_price: float
+    line_total: float
+
+class OrderDetailOut(OrderOut):
+    items: List[OrderItemOut]
+
+class ProductSalesOut(BaseModel):
+    product_id: str
+    units_sold: int
+    revenue: float
+    orders: int
+
+class OrderSummaryOut(BaseModel):
+    id: str
+    total_price: float
+    status: str
+    created_at: datetime
+
+class OrderPage(BaseModel):
+    items: List[OrderSummaryOut]
+    next_cursor: Optional[str] = None
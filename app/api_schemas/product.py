@@ -1,5 +1,5 @@
 from pydantic import BaseModel,ConfigDict
-from typing import Optional
+from typing import List, Optional
 
 class ProductCreate(BaseModel):
     name: str
@@ -14,5 +14,35 @@ class ProductOut(ProductCreate):
     name: str
     price: float
     category: Optional[str]
+    version: int = 0
 
     model_config = ConfigDict(from_attributes=True)
+
+class ProductPage(BaseModel):
+    items: List[ProductOut]
+    next_cursor: Optional[str] = None
+
+class CategoryFacet(BaseModel):
+    category: Optional[str]
+    count: int
+
+class PriceBucketFacet(BaseModel):
+    min_price: float
+    max_price: Optional[float]
+    count: int
+
+class ProductSearchFacets(BaseModel):
+    categories: List[CategoryFacet]
+    price_buckets: List[PriceBucketFacet]
+
+class ProductSearchPage(BaseModel):
+    items: List[ProductOut]
+    total: int
+    page: int
+    page_size: int
+    facets: ProductSearchFacets
+
+class AutocompleteSuggestion(BaseModel):
+    text: str
+    kind: str
+    product_id: Optional[str] = None
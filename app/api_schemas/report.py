@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class DailySalesOut(BaseModel):
+    day: str
+    orders: int
+    revenue: float
+
+class CategorySalesOut(BaseModel):
+    category: Optional[str]
+    units: int
+    revenue: float
+
+class ProductSalesSummaryOut(BaseModel):
+    product_id: str
+    units: int
+    revenue: float
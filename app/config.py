@@ -1,18 +1,100 @@
-# from decouple import config
+import os
+from typing import Optional
+from dotenv import load_dotenv
+from pydantic import BaseModel
 
-# # Security settings
-# SECRET_KEY = config("SECRET_KEY", default="your-secret-key-here")
-# ALGORITHM = "HS256"
-# ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# # Database settings
-# MONGODB_URL = config("MONGODB_URL", default="mongodb://localhost:27017")
-# DATABASE_NAME = config("DATABASE_NAME", default="online_shop")
+class Settings(BaseModel):
+    """Every tunable of the app, read from the environment (and .env) exactly once.
 
-# # Application settings
-# APP_NAME = "Online Shop API"
-# APP_VERSION = "1.0.0"
-# DEBUG = config("DEBUG", default=False, cast=bool)
+    Field names are the environment variable names in lower case; values are
+    coerced to the annotated types when the object is built.
+    """
 
-# .env file
+    # Database settings
+    mongo_uri: Optional[str] = None
+    database_name: Optional[str] = None
 
+    # Security settings
+    secret_key: Optional[str] = None
+    secret_refresh_key: Optional[str] = None
+    algorithm: str = "HS256"
+
+    # Connection pool settings (shared by every router through app.database.database)
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int = 300000
+    mongo_wait_queue_timeout_ms: int = 5000
+    # Comma separated wire compressors, e.g. "zstd,snappy,zlib" (empty disables compression)
+    mongo_compressors: str = ""
+    # Commands slower than this are written to the app.slow_queries log
+    mongo_slow_query_ms: float = 100
+
+    # Index reconciliation at startup: "apply" builds missing indexes in the background, "check" only
+    # reports drift, "off" skips it. Changed indexes are only ever dropped and rebuilt by the CLI
+    # (python -m app.indexes), never by app workers racing each other
+    index_reconcile_on_startup: str = "apply"
+
+    # Probes and monitoring snapshots
+    readiness_timeout_seconds: float = 1
+    db_stats_refresh_seconds: float = 30
+
+    # Product read cache
+    product_cache_max_entries: int = 10000
+    product_cache_ttl_seconds: float = 30
+
+    # Product name/category autocomplete index
+    autocomplete_max_entries: int = 200000
+    # Products created through other workers show up in suggestions within this many seconds
+    autocomplete_refresh_seconds: float = 60
+
+    # Password hashing worker pool (bcrypt runs off the event loop)
+    password_hash_workers: int = 4
+    # Hash/verify calls allowed to wait or run at once before new ones are rejected with 503
+    password_hash_max_pending: int = 64
+
+    # Current-user resolution cache (decoded JWT claims and user records)
+    auth_cache_max_entries: int = 10000
+    auth_cache_ttl_seconds: float = 60
+
+    # Cart line snapshots are re-validated against product versions at most this often
+    cart_snapshot_max_age_seconds: float = 300
+
+    # Checkout idempotency keys
+    idempotency_key_ttl_seconds: int = 86400
+    # How long a retry waits for the first attempt with the same key to finish
+    idempotency_wait_seconds: float = 10
+    # An in-progress key older than this is assumed abandoned (crashed worker) and may be taken over
+    idempotency_lock_seconds: float = 30
+
+    # Sales rollups: run every N seconds inside the app (0 disables; use the CLI instead)
+    sales_rollup_interval_seconds: float = 300
+    # Orders newer than this are left for the next run so in-flight checkouts are not missed
+    sales_rollup_lag_seconds: float = 60
+
+    # Background job queue
+    job_workers: int = 2
+    job_max_attempts: int = 5
+    job_retry_base_seconds: float = 2
+    job_retry_max_seconds: float = 300
+    # A running job whose lease expires (worker crashed) is picked up again
+    job_lease_seconds: float = 60
+    job_poll_seconds: float = 1
+
+    # Metrics; set a shared directory when running several workers so /metrics covers all of them
+    metrics_multiproc_dir: str = ""
+    metrics_flush_seconds: float = 5
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        # .env file; real environment variables take precedence
+        load_dotenv()
+        return cls(**{
+            name: os.environ[name.upper()]
+            for name in cls.model_fields
+            if name.upper() in os.environ
+        })
+
+
+# Global instance
+settings = Settings.from_env()
@@ -1,33 +1,89 @@
-import os
+import asyncio
+import time
 from typing import Dict, Any
-from dotenv import load_dotenv
-from pymongo import MongoClient, ASCENDING, TEXT
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import MongoClient
+from pymongo.database import Database
 from pymongo.errors import PyMongoError
 import logging
+from app.config import settings
+from app.models.user import User
+from app.utils.mongo_monitoring import CommandStatsListener, PoolStatsListener
+from app.utils.singleflight import SingleFlight
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 class DatabaseManager:
     def __init__(self):
         self.client: MongoClient | None = None
-        self.db = None
-        self.database_name = os.getenv("DATABASE_NAME")
+        self.db: Database | None = None
+        self.async_client: AsyncIOMotorClient | None = None
+        self.async_db: AsyncIOMotorDatabase | None = None
+        # Readiness probes only; see _probe_client_options
+        self.probe_client: AsyncIOMotorClient | None = None
+        self._probes = SingleFlight()
+        self.database_name = settings.database_name
+        self.pool_stats = PoolStatsListener()
+        self.command_stats = CommandStatsListener(settings.mongo_slow_query_ms)
+        self._stats_snapshot: Dict[str, Any] | None = None
+        self._stats_refreshed_at: float | None = None
+        self._stats_lock = asyncio.Lock()
+
+    def _client_options(self) -> Dict[str, Any]:
+        """Connection pool options of the async client that serves every request."""
+        options: Dict[str, Any] = {
+            "maxPoolSize": settings.mongo_max_pool_size,
+            "minPoolSize": settings.mongo_min_pool_size,
+            "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+            "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+            "event_listeners": [self.pool_stats, self.command_stats],
+        }
+        if settings.mongo_compressors:
+            options["compressors"] = settings.mongo_compressors
+        return options
+
+    def _sync_client_options(self) -> Dict[str, Any]:
+        """The sync client only pings at startup and backs the get_*_collection helpers.
+
+        One connection is plenty for that, and it is kept out of the pool stats so
+        /db-pool reports the pool that actually serves requests.
+        """
+        options = self._client_options()
+        options.update(maxPoolSize=1, minPoolSize=0, event_listeners=[self.command_stats])
+        return options
+
+    def _probe_client_options(self) -> Dict[str, Any]:
+        """Every timeout set to the readiness budget.
+
+        A ping during an outage then gives up, and frees Motor's executor thread, after
+        readiness_timeout_seconds instead of after serverSelectionTimeoutMS (30 s).
+        """
+        timeout_ms = int(settings.readiness_timeout_seconds * 1000)
+        return {
+            "maxPoolSize": 1,
+            "minPoolSize": 0,
+            "serverSelectionTimeoutMS": timeout_ms,
+            "connectTimeoutMS": timeout_ms,
+            "socketTimeoutMS": timeout_ms,
+        }
 
     def connect(self) -> bool:
-        """Initialize PyMongo client and database instance."""
+        """Initialize the PyMongo and Motor clients and database instances."""
         try:
-            mongo_uri = os.getenv("MONGO_URI")
+            mongo_uri = settings.mongo_uri
             if not mongo_uri or not self.database_name:
                 logger.error("Mongo URI or DATABASE_NAME environment variables not set.")
                 return False
 
-            self.client = MongoClient(mongo_uri)
+            self.client = MongoClient(mongo_uri, **self._sync_client_options())
             self.db = self.client[self.database_name]
+            # Async client used by the request path so routes never block the event loop
+            self.async_client = AsyncIOMotorClient(mongo_uri, **self._client_options())
+            self.async_db = self.async_client[self.database_name]
+            self.probe_client = AsyncIOMotorClient(mongo_uri, **self._probe_client_options())
 
             logger.info("✅ Successfully connected to MongoDB")
             return True
@@ -36,12 +92,15 @@ class DatabaseManager:
             return False
 
     def initialize(self) -> bool:
-        """Initialize database and create indexes."""
+        """Connect and verify with a single ping; indexes are reconciled separately (see app.indexes).
+
+        Startup also awaits init_odm, whose Beanie setup costs a buildInfo and a listIndexes
+        on users, so a cold start is three round-trips before the worker serves traffic.
+        """
         if not self.connect():
             return False
 
         try:
-            self.create_indexes()
             if not self.verify_connection():
                 return False
             logger.info("🎉 Database initialized successfully!")
@@ -50,9 +109,15 @@ class DatabaseManager:
             logger.error(f"❌ Database initialization failed: {e}")
             return False
 
+    async def init_odm(self) -> None:
+        """Bind Beanie documents to the shared async client (buildInfo plus listIndexes on users)."""
+        if self.async_db is None:
+            raise RuntimeError("Database is not connected")
+        await init_beanie(database=self.async_db, document_models=[User])
+
     def verify_connection(self) -> bool:
         """Ping the MongoDB server to verify connection."""
-        if not self.db:
+        if self.db is None:
             logger.error("Database is not connected.")
             return False
 
@@ -64,86 +129,18 @@ class DatabaseManager:
             logger.error(f"❌ Database verification failed: {e}")
             return False
 
-    def create_indexes(self) -> None:
-        """Create indexes on collections."""
-        if not self.db:
-            raise RuntimeError("Database is not connected")
-
-        logger.info("🔧 Creating database indexes...")
-
-        try:
-            self.db["users"].create_index("email", unique=True, name="email_unique")
-            self.db["users"].create_index("username", unique=True, name="username_unique")
-            self.db["users"].create_index("created_at", name="created_at_idx")
-            self.db["users"].create_index("is_active", name="is_active_idx")
-            logger.info("✅ Users indexes created")
-        except PyMongoError as e:
-            logger.warning(f"Users indexes creation warning: {e}")
-
-        try:
-            self.db["products"].create_index("name", name="name_idx")
-            self.db["products"].create_index("category", name="category_idx")
-            self.db["products"].create_index("price", name="price_idx")
-            self.db["products"].create_index("is_active", name="product_active_idx")
-            self.db["products"].create_index("created_at", name="product_created_idx")
-            self.db["products"].create_index("stock_quantity", name="stock_idx")
-            self.db["products"].create_index([("name", TEXT), ("description", TEXT)], name="search_text")
-            self.db["products"].create_index([("category", ASCENDING), ("price", ASCENDING)], name="category_price_idx")
-            logger.info("✅ Products indexes created")
-        except PyMongoError as e:
-            logger.warning(f"Products indexes creation warning: {e}")
-
-        try:
-            self.db["orders"].create_index("user_id", name="user_orders_idx")
-            self.db["orders"].create_index("status", name="order_status_idx")
-            self.db["orders"].create_index("created_at", name="order_created_idx")
-            self.db["orders"].create_index([("user_id", ASCENDING), ("created_at", -1)], name="user_orders_date_idx")
-            self.db["orders"].create_index([("status", ASCENDING), ("created_at", -1)], name="status_date_idx")
-            logger.info("✅ Orders indexes created")
-        except PyMongoError as e:
-            logger.warning(f"Orders indexes creation warning: {e}")
-
-        try:
-            self.db["cart"].create_index("user_id", unique=True, name="user_cart_unique")
-            self.db["cart"].create_index("updated_at", name="cart_updated_idx")
-            logger.info("✅ Cart indexes created")
-        except PyMongoError as e:
-            logger.warning(f"Cart indexes creation warning: {e}")
-
-        try:
-            self.db["order_items"].create_index("order_id", name="order_items_order_idx")
-            self.db["order_items"].create_index("product_id", name="order_items_product_idx")
-            self.db["order_items"].create_index([("order_id", ASCENDING), ("product_id", ASCENDING)], name="order_product_idx")
-            logger.info("✅ Order Items indexes created")
-        except PyMongoError as e:
-            logger.warning(f"Order Items indexes creation warning: {e}")
-
-        try:
-            self.db["sessions"].create_index("token", unique=True, name="token_unique")
-            self.db["sessions"].create_index("user_id", name="session_user_idx")
-            self.db["sessions"].create_index("expires_at", expireAfterSeconds=0, name="session_ttl")
-            logger.info("✅ Sessions indexes created")
-        except PyMongoError as e:
-            logger.warning(f"Sessions indexes creation warning: {e}")
-
-        try:
-            self.db["categories"].create_index("name", unique=True, name="category_name_unique")
-            self.db["categories"].create_index("slug", unique=True, name="category_slug_unique")
-            self.db["categories"].create_index("is_active", name="category_active_idx")
-            logger.info("✅ Categories indexes created")
-        except PyMongoError as e:
-            logger.warning(f"Categories indexes creation warning: {e}")
-
-        logger.info("🎉 All database indexes created successfully!")
-
     def disconnect(self) -> None:
         """Close the MongoDB connection."""
+        if self.async_client:
+            self.async_client.close()
+        if self.probe_client:
+            self.probe_client.close()
         if self.client:
             self.client.close()
             logger.info("🔌 Disconnected from MongoDB")
 
     def get_collection(self, name: str):
-        if not self.db:
+        if self.db is None:
             raise RuntimeError("Database not connected")
         return self.db[name]
 
@@ -175,53 +172,54 @@ class DatabaseManager:
     def categories(self):
         return self.get_collection("categories")
 
-    def health_check(self) -> Dict[str, Any]:
-        """Check database health and return status"""
-        if not self.client or not self.db:
-            return {"status": "unhealthy", "error": "Not connected", "connection": "failed"}
+    @property
+    def idempotency_keys(self):
+        return self.get_collection("idempotency_keys")
 
-        try:
-            self.db.command("ping")
-            stats = self.db.command("dbStats")
-            return {
-                "status": "healthy",
-                "database": self.database_name,
-                "collections": stats.get("collections", 0),
-                "data_size": stats.get("dataSize", 0),
-                "storage_size": stats.get("storageSize", 0),
-                "indexes": stats.get("indexes", 0),
-                "connection": "active",
-            }
-        except PyMongoError as e:
-            return {"status": "unhealthy", "error": str(e), "connection": "failed"}
+    @property
+    def jobs(self):
+        return self.get_collection("jobs")
 
-    def get_database_info(self) -> Dict[str, Any]:
-        """Get detailed database info"""
-        if not self.client or not self.db:
-            return {"error": "Not connected"}
+    async def ping(self, timeout: float) -> bool:
+        """Readiness check: one ping on the probe client, shared by every probe that arrives meanwhile."""
+        if self.probe_client is None:
+            return False
+        return await self._probes.do("ping", lambda: self._ping(timeout))
 
+    async def _ping(self, timeout: float) -> bool:
         try:
-            server_info = self.client.server_info()
-            db_stats = self.db.command("dbStats")
-            collections = self.db.list_collection_names()
-            collection_stats = {}
+            await asyncio.wait_for(self.probe_client.admin.command("ping"), timeout=timeout)
+            return True
+        except (asyncio.TimeoutError, PyMongoError):
+            return False
 
-            for collection_name in collections:
-                try:
-                    stats = self.db.command("collStats", collection_name)
-                    collection_stats[collection_name] = {
-                        "count": stats.get("count", 0),
-                        "size": stats.get("size", 0),
-                        "avgObjSize": stats.get("avgObjSize", 0),
-                        "totalIndexSize": stats.get("totalIndexSize", 0),
-                        "nindexes": stats.get("nindexes", 0),
-                    }
-                except PyMongoError:
-                    collection_stats[collection_name] = {"error": "Could not get stats"}
-
-            return {
+    async def refresh_stats(self) -> Dict[str, Any]:
+        """Collect server, database and per-collection stats concurrently into the cached snapshot."""
+        async with self._stats_lock:
+            server_info, db_stats, collections = await asyncio.gather(
+                self.async_client.server_info(),
+                self.async_db.command("dbStats"),
+                self.async_db.list_collection_names(),
+            )
+            results = await asyncio.gather(
+                *(self.async_db.command("collStats", name) for name in collections),
+                return_exceptions=True,
+            )
+            collection_stats = {}
+            for name, stats in zip(collections, results):
+                if isinstance(stats, BaseException):
+                    collection_stats[name] = {"error": "Could not get stats"}
+                    continue
+                collection_stats[name] = {
+                    "count": stats.get("count", 0),
+                    "size": stats.get("size", 0),
+                    "avgObjSize": stats.get("avgObjSize", 0),
+                    "totalIndexSize": stats.get("totalIndexSize", 0),
+                    "nindexes": stats.get("nindexes", 0),
+                }
+
+            self._stats_snapshot = {
                 "server_version": server_info.get("version"),
-                "database_name": self.database_name,
                 "collections": collections,
                 "collection_stats": collection_stats,
                 "database_stats": {
@@ -233,8 +231,76 @@ class DatabaseManager:
                     "index_size": db_stats.get("indexSize", 0),
                 },
             }
-        except PyMongoError as e:
-            return {"error": str(e)}
+            self._stats_refreshed_at = time.monotonic()
+            return self._stats_snapshot
+
+    async def stats_refresh_loop(self, interval: float) -> None:
+        """Background refresher so monitoring endpoints never hit Mongo themselves."""
+        while True:
+            try:
+                await self.refresh_stats()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Database stats refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    def _stats_age(self) -> float | None:
+        if self._stats_refreshed_at is None:
+            return None
+        return round(time.monotonic() - self._stats_refreshed_at, 3)
+
+    def health_check(self) -> Dict[str, Any]:
+        """Database health from the cached stats snapshot; no round-trip to the server"""
+        if self.client is None or self.db is None:
+            return {"status": "unhealthy", "error": "Not connected", "connection": "failed"}
+
+        snapshot = self._stats_snapshot
+        if snapshot is None:
+            return {"status": "starting", "database": self.database_name, "stats_age_seconds": None}
+
+        stats = snapshot["database_stats"]
+        age = self._stats_age()
+        return {
+            # A snapshot that stopped refreshing means the server has not answered for a while
+            "status": "healthy" if age <= 3 * settings.db_stats_refresh_seconds else "stale",
+            "database": self.database_name,
+            "collections": stats["collections"],
+            "data_size": stats["data_size"],
+            "storage_size": stats["storage_size"],
+            "indexes": stats["indexes"],
+            "connection": "active",
+            "stats_age_seconds": age,
+        }
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Return connection pool usage and configured limits"""
+        return {
+            "max_pool_size": settings.mongo_max_pool_size,
+            "min_pool_size": settings.mongo_min_pool_size,
+            "wait_queue_timeout_ms": settings.mongo_wait_queue_timeout_ms,
+            **self.pool_stats.snapshot(),
+        }
+
+    async def get_database_info(self) -> Dict[str, Any]:
+        """Get detailed database info from the cached snapshot, refreshing it only if none exists yet"""
+        if self.async_client is None or self.async_db is None:
+            return {"error": "Not connected"}
+
+        snapshot = self._stats_snapshot
+        if snapshot is None:
+            try:
+                snapshot = await self.refresh_stats()
+            except PyMongoError as e:
+                return {"error": str(e)}
+
+        return {
+            **snapshot,
+            "database_name": self.database_name,
+            "stats_age_seconds": self._stats_age(),
+            "connection_pool": self.get_pool_stats(),
+            "command_stats": self.command_stats.snapshot(),
+        }
 
 
 # Global instance
@@ -246,10 +312,15 @@ def create_tables() -> bool:
     return database.initialize()
 
 def get_db():
-    if not database.db:
+    if database.db is None:
         raise RuntimeError("Database not initialized")
     return database.db
 
+def get_async_db() -> AsyncIOMotorDatabase:
+    if database.async_db is None:
+        raise RuntimeError("Database not initialized")
+    return database.async_db
+
 def check_database_health() -> Dict[str, Any]:
     return database.health_check()
 
@@ -274,3 +345,9 @@ def get_sessions_collection():
 
 def get_categories_collection():
     return database.categories
+
+def get_idempotency_keys_collection():
+    return database.idempotency_keys
+
+def get_jobs_collection():
+    return database.jobs
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Declarative index spec: the single source of truth for every index the app relies on
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel("email", unique=True, name="email_unique"),
+        IndexModel("username", unique=True, name="username_unique"),
+        IndexModel("created_at", name="created_at_idx"),
+        IndexModel("is_active", name="is_active_idx"),
+    ],
+    "products": [
+        IndexModel("name", name="name_idx"),
+        IndexModel("category", name="category_idx"),
+        IndexModel("is_active", name="product_active_idx"),
+        IndexModel("stock_quantity", name="stock_idx"),
+        IndexModel([("name", TEXT), ("description", TEXT)], name="search_text"),
+        # Listing sort keys carry _id so keyset pagination is served entirely by the index
+        IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_idx"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="product_created_idx"),
+        IndexModel([("category", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)], name="category_price_idx"),
+        IndexModel([("category", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="category_created_idx"),
+    ],
+    "orders": [
+        IndexModel("user_id", name="user_orders_idx"),
+        IndexModel("status", name="order_status_idx"),
+        IndexModel("created_at", name="order_created_idx"),
+        # History sort keys carry _id so keyset pagination is served entirely by the index
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_orders_date_idx"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="status_date_idx"),
+    ],
+    "cart": [
+        IndexModel("user_id", unique=True, name="user_cart_unique"),
+        IndexModel("updated_at", name="cart_updated_idx"),
+    ],
+    "order_items": [
+        IndexModel("order_id", name="order_items_order_idx"),
+        IndexModel("product_id", name="order_items_product_idx"),
+        IndexModel([("order_id", ASCENDING), ("product_id", ASCENDING)], name="order_product_idx"),
+        # Sales rollup windows read line items by creation time
+        IndexModel("created_at", name="order_items_created_idx"),
+    ],
+    "sales_daily_category": [
+        IndexModel("day", name="sales_category_day_idx"),
+    ],
+    "sales_daily_product": [
+        IndexModel("day", name="sales_product_day_idx"),
+    ],
+    "sessions": [
+        IndexModel("token", unique=True, name="token_unique"),
+        IndexModel("user_id", name="session_user_idx"),
+        IndexModel("expires_at", expireAfterSeconds=0, name="session_ttl"),
+    ],
+    "idempotency_keys": [
+        IndexModel("expires_at", expireAfterSeconds=0, name="idempotency_ttl"),
+    ],
+    "jobs": [
+        # Serves the worker claim query; finished jobs expire after a week, dead ones are kept
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="jobs_status_run_at_idx"),
+        IndexModel(
+            "finished_at",
+            expireAfterSeconds=7 * 24 * 3600,
+            partialFilterExpression={"status": "done"},
+            name="jobs_done_ttl",
+        ),
+    ],
+    "categories": [
+        IndexModel("name", unique=True, name="category_name_unique"),
+        IndexModel("slug", unique=True, name="category_slug_unique"),
+        IndexModel("is_active", name="category_active_idx"),
+    ],
+}
+
+# Options that change what an index enforces or contains; anything else the server reports is ignored
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+# Result of the last reconciliation, reported by /index-drift
+index_drift: Dict[str, Any] = {"checked_at": None}
+
+
+def _normalize(value: Any) -> Any:
+    # The server may hand back 1.0 where the spec says 1
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _definition(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Comparable form of an index, from either an IndexModel document or a list_indexes entry."""
+    # Key order matters for compound indexes, so keys are compared as ordered pairs
+    key = [[field, _normalize(direction)] for field, direction in document["key"].items()]
+    if any(direction == TEXT for _, direction in key) or key[0][0] == "_fts":
+        # Text indexes are reported as {_fts, _ftsx} with the fields moved into weights
+        fields = document.get("weights") or {field: 1 for field, direction in key if direction == TEXT}
+        key = [["$text", sorted(fields)]]
+    definition = {"key": key}
+    for option in COMPARED_OPTIONS:
+        # "is not None" on purpose: expireAfterSeconds=0 is a real TTL
+        if document.get(option) is not None:
+            definition[option] = _normalize(document[option])
+    return definition
+
+
+async def _diff_collection(db: AsyncIOMotorDatabase, collection: str, models: List[IndexModel]) -> Dict[str, Any]:
+    existing = {index["name"]: index async for index in db[collection].list_indexes()}
+    missing, changed = [], []
+    for model in models:
+        name = model.document["name"]
+        if name not in existing:
+            missing.append(model)
+        elif _definition(existing[name]) != _definition(model.document):
+            changed.append(model)
+    wanted = {model.document["name"] for model in models}
+    extra = sorted(name for name in existing if name not in wanted and name != "_id_")
+    return {"missing": missing, "changed": changed, "extra": extra}
+
+
+async def diff_indexes(db: AsyncIOMotorDatabase) -> Dict[str, Dict[str, Any]]:
+    """Compare the spec with the server, one list_indexes per collection, all issued concurrently."""
+    collections = list(INDEXES)
+    results = await asyncio.gather(*(_diff_collection(db, name, INDEXES[name]) for name in collections))
+    return dict(zip(collections, results))
+
+
+def _report(diff: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "checked_at": datetime.utcnow(),
+        "in_sync": not any(d["missing"] or d["changed"] or d["extra"] for d in diff.values()),
+        "collections": {
+            collection: {
+                "missing": [model.document["name"] for model in d["missing"]],
+                "changed": [model.document["name"] for model in d["changed"]],
+                "extra": d["extra"],
+            }
+            for collection, d in diff.items()
+            if d["missing"] or d["changed"] or d["extra"]
+        },
+    }
+
+
+async def reconcile_indexes(db: AsyncIOMotorDatabase, apply: bool = True, rebuild_changed: bool = False) -> Dict[str, Any]:
+    """Build missing indexes and, with rebuild_changed, drop and rebuild changed ones.
+
+    Extra indexes are only reported, never dropped. Rebuilding is destructive (the old index is
+    gone until the new one finishes), so only the deploy CLI asks for it.
+    """
+    diff = await diff_indexes(db)
+    report = _report(diff)
+    if apply:
+        for collection, d in diff.items():
+            to_build = d["missing"] + (d["changed"] if rebuild_changed else [])
+            if not to_build:
+                continue
+            try:
+                # A definition change under the same name can only be applied by dropping the old index
+                if rebuild_changed:
+                    for model in d["changed"]:
+                        await db[collection].drop_index(model.document["name"])
+                await db[collection].create_indexes(to_build)
+                logger.info(f"✅ {collection}: built {len(to_build)} indexes")
+            except PyMongoError as e:
+                # Anything left unbuilt shows up as missing in the report below
+                logger.error(f"❌ {collection} index build failed: {e}")
+        # What is left after applying is the drift worth reporting
+        report = _report(await diff_indexes(db))
+
+    index_drift.clear()
+    index_drift.update(report)
+    if not report["in_sync"]:
+        logger.warning(f"Index drift detected: {report['collections']}")
+    return report
+
+
+async def reconcile_in_background(db: AsyncIOMotorDatabase, apply: bool) -> None:
+    """Startup task; the worker serves traffic while the server builds missing indexes."""
+    try:
+        await reconcile_indexes(db, apply=apply)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Index reconciliation failed: {e}")
+
+
+if __name__ == "__main__":
+    # Deploy step: python -m app.indexes [--check]; the only place changed indexes are rebuilt
+    from app.database import database
+
+    parser = argparse.ArgumentParser(description="Reconcile MongoDB indexes with the declared spec")
+    parser.add_argument("--check", action="store_true", help="report drift without building anything")
+    args = parser.parse_args()
+
+    if not database.connect():
+        raise SystemExit(1)
+    try:
+        result = asyncio.run(reconcile_indexes(database.async_db, apply=not args.check, rebuild_changed=True))
+        print(result)
+    finally:
+        database.disconnect()
+    raise SystemExit(0 if result["in_sync"] else 2)
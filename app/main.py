@@ -1,14 +1,29 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.openapi.utils import get_openapi
 
-from app.routers import user, product, order, auth, cart
-from app.database import database , DatabaseManager  # Import the global instance here
+from app.routers import user, product, order, auth, cart, report
+from app.config import settings
+from app.database import database  # Import the global instance here
+from app.indexes import index_drift, reconcile_in_background
+from app.utils.auth import password_hashing_stats
+from app.utils.metrics import MetricsMiddleware, metrics_flush_loop, registry
+from app.utils.mongo_monitoring import bind_caller_task
+from app.services.job_services import job_queue
+from app.services.report_services import sales_rollup_loop
+from app.services.user_services import token_claims_cache, current_user_cache
+from app.services.product_services import (
+    product_cache, product_reads, product_autocomplete, autocomplete_refresh_loop, backfill_product_created_at,
+)
 
 app = FastAPI(
     title="E-Commerce API",
     description="Backend API for an E-Commerce Platform",
-    version="1.0.0"
+    version="1.0.0",
+    dependencies=[Depends(bind_caller_task)],
 )
 
 # Configure CORS
@@ -19,6 +34,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(auth.router, tags=["Authentication"], prefix="/api/auth")
@@ -26,6 +42,7 @@ app.include_router(user.router, tags=["Users"], prefix="/api/users")
 app.include_router(product.router, tags=["Products"], prefix="/api/products")
 app.include_router(order.router, tags=["Orders"], prefix="/api/orders")
 app.include_router(cart.router, tags=["Shopping Cart"], prefix="/api/cart")
+app.include_router(report.router, tags=["Reports"], prefix="/api/reports")
 
 @app.on_event("startup")
 async def startup_event():
@@ -33,12 +50,40 @@ async def startup_event():
     success = database.initialize()
     if success == False:
         raise HTTPException(status_code=500, detail="❌ Failed to initialize the database")
+    # Awaited rather than backgrounded: every authenticated route queries User through Beanie
+    await database.init_odm()
+    if settings.index_reconcile_on_startup != "off":
+        app.state.index_reconcile = asyncio.create_task(
+            reconcile_in_background(database.async_db, apply=settings.index_reconcile_on_startup == "apply")
+        )
+    # Products from before created_at was recorded, so the "newest" listing can page through them
+    app.state.product_backfill = asyncio.create_task(backfill_product_created_at(database.async_db))
+    # Full products scan, then incremental refreshes; suggestions fill in shortly after the worker starts serving
+    app.state.autocomplete_refresh = asyncio.create_task(
+        autocomplete_refresh_loop(database.async_db, settings.autocomplete_refresh_seconds)
+    )
+    if settings.sales_rollup_interval_seconds > 0:
+        app.state.sales_rollup = asyncio.create_task(
+            sales_rollup_loop(database.async_db, settings.sales_rollup_interval_seconds)
+        )
+    if settings.job_workers > 0:
+        job_queue.start(database.async_db, settings.job_workers)
+    app.state.db_stats_refresh = asyncio.create_task(database.stats_refresh_loop(settings.db_stats_refresh_seconds))
+    if settings.metrics_multiproc_dir:
+        app.state.metrics_flush = asyncio.create_task(
+            metrics_flush_loop(settings.metrics_multiproc_dir, settings.metrics_flush_seconds)
+        )
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close the MongoDB connection on shutdown"""
-    DatabaseManager.disconnect()
+    for name in ("index_reconcile", "product_backfill", "autocomplete_refresh", "sales_rollup", "metrics_flush", "db_stats_refresh"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    await job_queue.stop()
+    database.disconnect()
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -48,13 +93,57 @@ async def root():
         "status": "healthy"
     }
 
+@app.get("/livez", tags=["Monitoring"])
+async def liveness():
+    # The process is up and the event loop is turning; no I/O on purpose
+    return {"status": "alive"}
+
+@app.get("/readyz", tags=["Monitoring"])
+async def readiness():
+    if not await database.ping(settings.readiness_timeout_seconds):
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ready"}
+
 @app.get("/health", tags=["Monitoring"])
 async def health_check():
-    return DatabaseManager.health_check()
+    return database.health_check()
 
 @app.get("/db-info", tags=["Monitoring"])
 async def database_info():
-    return DatabaseManager.get_database_info()
+    return await database.get_database_info()
+
+@app.get("/index-drift", tags=["Monitoring"])
+async def index_drift_report():
+    return index_drift
+
+@app.get("/db-pool", tags=["Monitoring"])
+async def database_pool():
+    return database.get_pool_stats()
+
+@app.get("/cache-stats", tags=["Monitoring"])
+async def cache_stats():
+    return {
+        "products": product_cache.stats(),
+        "product_reads": product_reads.stats(),
+        "autocomplete": product_autocomplete.stats(),
+        "auth_claims": token_claims_cache.stats(),
+        "auth_users": current_user_cache.stats(),
+    }
+
+@app.get("/auth-stats", tags=["Monitoring"])
+async def auth_stats():
+    return password_hashing_stats()
+
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        registry.render(settings.metrics_multiproc_dir or None),
+        media_type="text/plain; version=0.0.4",
+    )
+
+@app.get("/job-stats", tags=["Monitoring"])
+async def job_stats():
+    return await job_queue.get_stats(database.async_db)
 
 # Custom OpenAPI schema
 def custom_openapi():
@@ -19,3 +19,6 @@ class User(Document):
     is_active: bool = True
 
     model_config = ConfigDict(from_attributes=True)
+
+    class Settings:
+        name = "users"
@@ -1,24 +1,54 @@
 from fastapi import APIRouter, Depends
-from pymongo.database import Database
-from app.api_schemas.cart import CartOut
-from app.services.cart_services import add_item_to_cart, build_cart_out, get_or_create_cart
-from app.database import get_db
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.api_schemas.cart import CartBulkOut, CartCreate, CartOut
+from app.models.user import User
+from app.services.cart_services import (
+    add_item_to_cart, build_cart_out, bulk_update_cart, get_or_create_cart, remove_item_from_cart, update_cart_item_quantity,
+)
+from app.services.user_services import get_current_user
+from app.database import get_async_db
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 @router.post("/add", response_model=CartOut)
-def add_item(
-    user_id: str,
+async def add_item(
     product_id: str,
     quantity: int,
-    db: Database = Depends(get_db),  # ✅ use PyMongo db
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
 ):
-    return add_item_to_cart(db, user_id, product_id, quantity)
+    return await add_item_to_cart(db, str(current_user.user_Id), product_id, quantity)
+
+@router.post("/items", response_model=CartBulkOut)
+async def add_items(
+    data: CartCreate,
+    replace: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await bulk_update_cart(db, str(current_user.user_Id), data.items, replace)
 
 @router.get("/", response_model=CartOut)
-def view_cart(
-    user_id: str,
-    db: Database = Depends(get_db),  # ✅ use PyMongo db
+async def view_cart(
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    cart = await get_or_create_cart(db, str(current_user.user_Id))
+    return await build_cart_out(db, cart)
+
+@router.put("/items/{product_id}", response_model=CartOut)
+async def update_item(
+    product_id: str,
+    quantity: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await update_cart_item_quantity(db, str(current_user.user_Id), product_id, quantity)
+
+@router.delete("/items/{product_id}", response_model=CartOut)
+async def remove_item(
+    product_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
 ):
-    cart = get_or_create_cart(db, user_id)
-    return build_cart_out(db, cart)
+    return await remove_item_from_cart(db, str(current_user.user_Id), product_id)
@@ -1,22 +1,56 @@
-from fastapi import APIRouter, Depends
-from pymongo import MongoClient
-from pymongo.database import Database
-from app.api_schemas.cart import CartOut
-from app.services.cart_services import add_item_to_cart, build_cart_out, get_or_create_cart
+from fastapi import APIRouter, Depends, Header, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Optional
+from app.api_schemas.order import OrderDetailOut, OrderOut, OrderPage, ProductSalesOut
+from app.models.order import OrderStatus
+from app.models.user import User
+from app.services.idempotency_services import run_idempotent
+from app.services.order_services import (
+    get_order, get_product_sales, list_orders, place_order, DEFAULT_ORDER_PAGE_SIZE, MAX_ORDER_PAGE_SIZE,
+)
+from app.services.user_services import get_current_admin, get_current_user
+from app.database import get_async_db
 
-router = APIRouter(prefix="/cart", tags=["Cart"])
+# Mounted at /api/orders by app.main; no prefix of its own
+router = APIRouter(tags=["Orders"])
 
-def get_database() -> Database:
-    """Dependency to get MongoDB database connection"""
-    # Replace with your actual MongoDB connection string
-    client = MongoClient("mongodb://localhost:27017")
-    return client.your_database_name  # Replace with your actual database name
+@router.post("", response_model=OrderOut)
+async def checkout(
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    user_id = str(current_user.user_Id)
+    if not idempotency_key:
+        return await place_order(db, user_id)
 
-@router.post("/add", response_model=CartOut)
-async def add_item(user_id: str, product_id: str, quantity: int, db: Database = Depends(get_database)):
-    return await add_item_to_cart(db, user_id, product_id, quantity)
+    async def checkout_once():
+        return (await place_order(db, user_id)).model_dump()
 
-@router.get("/", response_model=CartOut)
-async def view_cart(user_id: str, db: Database = Depends(get_database)):
-    cart = await get_or_create_cart(db, user_id)
-    return await build_cart_out(db, cart)
\ No newline at end of file
+    return OrderOut(**await run_idempotent(db, f"checkout:{user_id}", idempotency_key, checkout_once))
+
+@router.get("", response_model=OrderPage)
+async def order_history(
+    limit: int = Query(DEFAULT_ORDER_PAGE_SIZE, ge=1, le=MAX_ORDER_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[OrderStatus] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await list_orders(db, str(current_user.user_Id), limit, cursor, status.value if status else None)
+
+@router.get("/sales/products/{product_id}", response_model=ProductSalesOut)
+async def product_sales(
+    product_id: str,
+    _admin: User = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await get_product_sales(db, product_id)
+
+@router.get("/{order_id}", response_model=OrderDetailOut)
+async def retrieve(
+    order_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await get_order(db, str(current_user.user_Id), order_id)
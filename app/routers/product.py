@@ -1,19 +1,66 @@
-from fastapi import APIRouter, Depends
-from pymongo.database import Database
-from app.api_schemas.product import ProductCreate, ProductOut
-from app.services.product_services import create_product, get_product, list_products
-from app.database import get_db # You'll need to create this dependency
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.api_schemas.product import AutocompleteSuggestion, ProductCreate, ProductOut, ProductPage, ProductSearchPage
+from app.services.product_services import (
+    create_product, get_product, list_products, export_products, search_products, autocomplete_products,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_SEARCH_PAGE, EXPORT_FIELDS, DEFAULT_EXPORT_BATCH_SIZE, MAX_EXPORT_BATCH_SIZE,
+)
+from app.database import get_async_db
 
-router = APIRouter(prefix="/products", tags=["Products"])
+# Mounted at /api/products by app.main; no prefix of its own
+router = APIRouter(tags=["Products"])
 
-@router.post("/", response_model=ProductOut)
-async def create(data: ProductCreate, db: Database = Depends(get_db)):
+@router.post("", response_model=ProductOut)
+async def create(data: ProductCreate, db: AsyncIOMotorDatabase = Depends(get_async_db)):
     return await create_product(db, data)
 
+@router.get("/autocomplete", response_model=list[AutocompleteSuggestion])
+async def autocomplete(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    return autocomplete_products(q, limit)
+
+@router.get("/search", response_model=ProductSearchPage)
+async def search(
+    q: str = Query(..., min_length=1),
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    page: int = Query(1, ge=1, le=MAX_SEARCH_PAGE),
+    page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await search_products(db, q, category, min_price, max_price, page, page_size)
+
+@router.get("/export")
+async def export_catalog(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    fields: Optional[str] = Query(None, description="Comma separated subset of exported fields"),
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    if selected and any(field not in EXPORT_FIELDS for field in selected):
+        raise HTTPException(status_code=400, detail=f"Exportable fields are: {', '.join(EXPORT_FIELDS)}")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_products(db, format, selected, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=products.{format}"},
+    )
+
 @router.get("/{product_id}", response_model=ProductOut)
-async def retrieve(product_id: str, db: Database = Depends(get_db)):
+async def retrieve(product_id: str, db: AsyncIOMotorDatabase = Depends(get_async_db)):
     return await get_product(db, product_id)
 
-@router.get("/", response_model=list[ProductOut])
-async def list_all(db: Database = Depends(get_db)):
-    return await list_products(db)
\ No newline at end of file
+@router.get("", response_model=ProductPage)
+async def list_all(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: Literal["newest", "price_asc", "price_desc"] = "newest",
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await list_products(db, limit, cursor, category, min_price, max_price, sort)
@@ -0,0 +1,40 @@
+from datetime import date
+from fastapi import APIRouter, Depends, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Optional
+from app.api_schemas.report import CategorySalesOut, DailySalesOut, ProductSalesSummaryOut
+from app.models.user import User
+from app.services.report_services import get_category_sales, get_daily_sales, get_top_products
+from app.services.user_services import get_current_admin
+from app.database import get_async_db
+
+# Mounted at /api/reports by app.main; no prefix of its own
+router = APIRouter(tags=["Reports"])
+
+@router.get("/sales/daily", response_model=list[DailySalesOut])
+async def daily_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    _admin: User = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await get_daily_sales(db, start, end)
+
+@router.get("/sales/categories", response_model=list[CategorySalesOut])
+async def category_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    _admin: User = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await get_category_sales(db, start, end)
+
+@router.get("/sales/products", response_model=list[ProductSalesSummaryOut])
+async def top_products(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=100),
+    _admin: User = Depends(get_current_admin),
+    db: AsyncIOMotorDatabase = Depends(get_async_db),
+):
+    return await get_top_products(db, start, end, limit)
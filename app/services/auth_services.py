@@ -26,7 +26,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
             detail="Inactive user"
         )
         
-    access_token = create_access_token(str(user.user_Id))
+    access_token = create_access_token({"sub": str(user.user_Id)})
     refresh_token = create_refresh_token(str(user.user_Id))
     
     return {
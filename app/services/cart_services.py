@@ -1,52 +1,212 @@
 from bson import ObjectId
-from pymongo.collection import Collection
+from datetime import datetime
 from fastapi import HTTPException
-from typing import List, Dict
-from app.api_schemas.cart import CartOut, CartItemOut
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from typing import Iterable, List, Dict
+from app.config import settings
+from app.api_schemas.cart import CartOut, CartItemOut, CartItemCreate, CartItemResult, CartBulkOut
 from app.api_schemas.product import ProductOut
-from app.models.cart import CartItem
-from app.models.product import Product
+from app.services.product_services import get_products_by_ids, invalidate_products
 
-def get_or_create_cart(carts_collection: Collection, user_id: str) -> Dict:
-    cart = carts_collection.find_one({"user_id": user_id})
-    if not cart:
-        cart = {
-            "user_id": user_id,
-            "items": []
-        }
-        result = carts_collection.insert_one(cart)
-        cart["_id"] = result.inserted_id
-    return cart
-
-def add_item_to_cart(carts_collection: Collection, products_collection: Collection, user_id: str, product_id: str, quantity: int) -> CartOut:
+# Product fields are copied into each cart line so cart views need no join against products
+def _snapshot_from_product(product: ProductOut) -> Dict:
+    return {
+        "name": product.name,
+        "unit_price": product.price,
+        "image_url": product.image_url,
+        "product_version": product.version,
+    }
+
+async def _load_snapshots(db: AsyncIOMotorDatabase, product_ids: Iterable[str]) -> Dict[str, Dict]:
+    # Goes through the product read cache; misses are fetched with one $in query
+    products = await get_products_by_ids(db, product_ids)
+    return {product_id: _snapshot_from_product(product) for product_id, product in products.items()}
+
+async def get_or_create_cart(db: AsyncIOMotorDatabase, user_id: str) -> Dict:
+    # Upsert so a missing cart is created in the same round-trip that reads it
+    return await db.cart.find_one_and_update(
+        {"user_id": user_id},
+        {"$setOnInsert": {"items": [], "updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def add_item_to_cart(db: AsyncIOMotorDatabase, user_id: str, product_id: str, quantity: int) -> CartOut:
+    if quantity < 1:
+        raise HTTPException(status_code=400, detail="Quantity must be at least 1")
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product ID")
-
-    product = products_collection.find_one({"_id": ObjectId(product_id)})
-    if not product:
+    snapshot = (await _load_snapshots(db, [product_id])).get(product_id)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    cart = get_or_create_cart(carts_collection, user_id)
+    # One write either bumps the existing line (refreshing its snapshot) or appends a new one
+    update = _merge_into_cart_pipeline([{"product_id": product_id, "quantity": quantity, **snapshot}], datetime.utcnow())
+    try:
+        cart = await db.cart.find_one_and_update(
+            {"user_id": user_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent request created the cart first; it exists now, so the retry just updates it
+        cart = await db.cart.find_one_and_update(
+            {"user_id": user_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    return await build_cart_out(db, cart)
+
+async def update_cart_item_quantity(db: AsyncIOMotorDatabase, user_id: str, product_id: str, quantity: int) -> CartOut:
+    if quantity < 1:
+        return await remove_item_from_cart(db, user_id, product_id)
+
+    cart = await db.cart.find_one_and_update(
+        {"user_id": user_id, "items.product_id": product_id},
+        {"$set": {"items.$.quantity": quantity, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not cart:
+        raise HTTPException(status_code=404, detail="Item not in cart")
+    return await build_cart_out(db, cart)
+
+async def remove_item_from_cart(db: AsyncIOMotorDatabase, user_id: str, product_id: str) -> CartOut:
+    cart = await db.cart.find_one_and_update(
+        {"user_id": user_id},
+        {"$pull": {"items": {"product_id": product_id}}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    return await build_cart_out(db, cart)
+
+def _merge_into_cart_pipeline(items: List[Dict], now: datetime) -> List[Dict]:
+    """Update pipeline adding quantities for existing lines and appending new ones in one write."""
+    incoming = {"$literal": items}
+    return [{"$set": {
+        "items": {"$let": {
+            "vars": {"current": {"$ifNull": ["$items", []]}},
+            "in": {"$concatArrays": [
+                {"$map": {
+                    "input": "$$current",
+                    "as": "line",
+                    "in": {"$let": {
+                        "vars": {"matches": {"$filter": {"input": incoming, "as": "new", "cond": {"$eq": ["$$new.product_id", "$$line.product_id"]}}}},
+                        # Incoming lines are unique per product, so at most one matches
+                        "in": {"$mergeObjects": [
+                            "$$line",
+                            {"$ifNull": [{"$arrayElemAt": ["$$matches", 0]}, {}]},
+                            {"quantity": {"$add": ["$$line.quantity", {"$sum": "$$matches.quantity"}]}},
+                        ]},
+                    }},
+                }},
+                {"$filter": {"input": incoming, "as": "new", "cond": {"$not": [{"$in": ["$$new.product_id", "$$current.product_id"]}]}}},
+            ]},
+        }},
+        "updated_at": now,
+    }}]
+
+async def bulk_update_cart(db: AsyncIOMotorDatabase, user_id: str, items: List[CartItemCreate], replace: bool = False) -> CartBulkOut:
+    """Validate every product with one lookup and apply all valid lines in a single write."""
+    results: List[CartItemResult] = []
+    quantities: Dict[str, int] = {}
+    candidates: List[str] = []
+    for item in items:
+        if not ObjectId.is_valid(item.product_id):
+            results.append(CartItemResult(product_id=item.product_id, status="invalid_id"))
+        elif item.quantity < 1:
+            results.append(CartItemResult(product_id=item.product_id, status="invalid_quantity"))
+        else:
+            candidates.append(item.product_id)
+            results.append(CartItemResult(product_id=item.product_id, status="ok"))
 
-    # Update or add item
-    for item in cart["items"]:
-        if item["product_id"] == product_id:
-            item["quantity"] += quantity
-            break
+    snapshots = await _load_snapshots(db, candidates)
+    for result, item in zip(results, items):
+        if result.status != "ok":
+            continue
+        if item.product_id not in snapshots:
+            result.status = "not_found"
+            continue
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    lines = [
+        {"product_id": product_id, "quantity": quantity, **snapshots[product_id]}
+        for product_id, quantity in quantities.items()
+    ]
+    now = datetime.utcnow()
+    if replace:
+        update = {"$set": {"items": lines, "updated_at": now}}
     else:
-        cart["items"].append({"product_id": product_id, "quantity": quantity})
+        update = _merge_into_cart_pipeline(lines, now)
+    cart = await db.cart.find_one_and_update(
+        {"user_id": user_id},
+        update,
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return CartBulkOut(cart=await build_cart_out(db, cart), results=results)
+
+async def _refresh_snapshots(db: AsyncIOMotorDatabase, cart: Dict) -> List[Dict]:
+    """Re-read only the products whose version moved since their line was snapshotted."""
+    items = cart["items"]
+    product_ids = [ObjectId(item["product_id"]) for item in items if ObjectId.is_valid(item["product_id"])]
+    versions: Dict[str, int] = {}
+    if product_ids:
+        async for doc in db.products.find({"_id": {"$in": product_ids}}, {"version": 1}):
+            versions[str(doc["_id"])] = doc.get("version", 0)
+
+    changed = [
+        item["product_id"] for item in items
+        if item["product_id"] in versions
+        and ("product_version" not in item or item["product_version"] != versions[item["product_id"]])
+    ]
+    # The cached copies of these products are older than what Mongo just reported
+    invalidate_products(changed)
+    snapshots = await _load_snapshots(db, changed)
+
+    now = datetime.utcnow()
+    # Positional updates per changed line, so concurrent quantity changes are not overwritten
+    ops = [
+        UpdateOne(
+            {"_id": cart["_id"], "items.product_id": product_id},
+            {"$set": {f"items.$.{key}": value for key, value in snapshot.items()}},
+        )
+        for product_id, snapshot in snapshots.items()
+    ]
+    # Lines whose product was deleted are dropped, otherwise checkout would reject a line nobody can see
+    deleted = [item["product_id"] for item in items if item["product_id"] not in versions]
+    update: Dict = {"$set": {"snapshot_checked_at": now}}
+    if deleted:
+        update["$pull"] = {"items": {"product_id": {"$in": deleted}}}
+    ops.append(UpdateOne({"_id": cart["_id"]}, update))
+    await db.cart.bulk_write(ops, ordered=False)
 
-    carts_collection.update_one({"_id": cart["_id"]}, {"$set": {"items": cart["items"]}})
+    return [
+        {**item, **snapshots.get(item["product_id"], {})}
+        for item in items
+        if item["product_id"] in versions
+    ]
 
-    return build_cart_out(products_collection, cart)
+def _snapshot_is_fresh(cart: Dict) -> bool:
+    checked_at = cart.get("snapshot_checked_at")
+    if checked_at is None:
+        return False
+    return (datetime.utcnow() - checked_at.replace(tzinfo=None)).total_seconds() < settings.cart_snapshot_max_age_seconds
 
-def build_cart_out(products_collection: Collection, cart: Dict) -> CartOut:
-    enriched_items: List[CartItemOut] = []
+async def build_cart_out(db: AsyncIOMotorDatabase, cart: Dict) -> CartOut:
+    items = cart["items"]
+    # Cart views are a single document read while every line's snapshot is recent
+    if items and (not _snapshot_is_fresh(cart) or any("product_version" not in item for item in items)):
+        items = await _refresh_snapshots(db, cart)
 
-    for item in cart["items"]:
-        product = products_collection.find_one({"_id": ObjectId(item["product_id"])})
-        if product:
-            product_out = ProductOut(**product, id=str(product["_id"]))
-            enriched_items.append(CartItemOut(product=product_out, quantity=item["quantity"]))
+    enriched_items = [
+        CartItemOut(
+            id=item["product_id"],
+            product_id=item["product_id"],
+            name=item["name"],
+            price=item.get("unit_price"),
+            image_url=item.get("image_url"),
+            quantity=item["quantity"],
+        )
+        for item in items
+    ]
 
     return CartOut(id=str(cart["_id"]), user_id=cart["user_id"], items=enriched_items)
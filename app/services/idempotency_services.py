@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.config import settings
+from app.utils.singleflight import SingleFlight
+
+# Retries with the same key inside this worker share the first attempt directly
+_local_attempts = SingleFlight()
+
+# Polling interval bounds while another worker holds the key
+POLL_INITIAL_SECONDS = 0.05
+POLL_MAX_SECONDS = 0.5
+
+async def _claim(db: AsyncIOMotorDatabase, key_id: str, record: Optional[Dict[str, Any]]) -> bool:
+    """Mark the key as in progress for this attempt; False when another attempt owns it."""
+    now = datetime.utcnow()
+    if record is None:
+        try:
+            await db.idempotency_keys.insert_one({
+                "_id": key_id,
+                "status": "in_progress",
+                "locked_at": now,
+                "expires_at": now + timedelta(seconds=settings.idempotency_key_ttl_seconds),
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+    # Take over keys whose owner died mid-request
+    stale_before = now - timedelta(seconds=settings.idempotency_lock_seconds)
+    taken = await db.idempotency_keys.find_one_and_update(
+        {"_id": key_id, "status": "in_progress", "locked_at": {"$lt": stale_before}},
+        {"$set": {"locked_at": now}},
+    )
+    return taken is not None
+
+async def _wait_for_result(db: AsyncIOMotorDatabase, key_id: str) -> Optional[Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.idempotency_wait_seconds
+    delay = POLL_INITIAL_SECONDS
+    while True:
+        record = await db.idempotency_keys.find_one({"_id": key_id})
+        if record is None:
+            # The first attempt failed and released the key; let this request run it
+            return None
+        if record["status"] == "completed":
+            return record["response"]
+        if loop.time() >= deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+
+async def _run_once(db: AsyncIOMotorDatabase, key_id: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    while True:
+        # Replays are answered straight from this lookup by _id
+        record = await db.idempotency_keys.find_one({"_id": key_id})
+        if record is not None and record["status"] == "completed":
+            return record["response"]
+
+        if await _claim(db, key_id, record):
+            try:
+                response = await fn()
+            except HTTPException:
+                # Validation and stock errors are raised before anything is committed, so the
+                # client may retry with the same key
+                await db.idempotency_keys.delete_one({"_id": key_id, "status": "in_progress"})
+                raise
+            # Any other failure (driver error, cancellation) may come after the commit; the key stays
+            # in progress and a retry only runs again once the stale-lock timeout has passed
+            await db.idempotency_keys.update_one(
+                {"_id": key_id},
+                {"$set": {"status": "completed", "response": response}},
+            )
+            return response
+
+        response = await _wait_for_result(db, key_id)
+        if response is not None:
+            return response
+
+async def run_idempotent(
+    db: AsyncIOMotorDatabase,
+    scope: str,
+    key: str,
+    fn: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """Run fn at most once per (scope, key) and replay its stored response afterwards.
+
+    A completed key is answered with one lookup by _id. Concurrent duplicates wait for
+    the attempt in progress instead of racing it.
+    """
+    key_id = f"{scope}:{key}"
+    return await _local_attempts.do(key_id, lambda: _run_once(db, key_id, fn))
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.config import settings
+from app.utils.mongo_monitoring import bind_caller_task
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[AsyncIOMotorDatabase, Dict[str, Any]], Awaitable[None]]
+
+
+class JobQueue:
+    """Durable in-process job queue backed by the jobs collection.
+
+    Jobs are inserted before anything else happens, so they survive restarts. Workers
+    claim them with a lease; a failure is retried with exponential backoff and, after
+    JOB_MAX_ATTEMPTS, left in the collection with status "dead" for inspection.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def handler(self, job_type: str) -> Callable[[JobHandler], JobHandler]:
+        def register(fn: JobHandler) -> JobHandler:
+            self._handlers[job_type] = fn
+            return fn
+        return register
+
+    def _type_stats(self, job_type: str) -> Dict[str, float]:
+        return self.stats.setdefault(job_type, {
+            "enqueued": 0, "succeeded": 0, "retried": 0, "dead": 0,
+            "wait_total_ms": 0.0, "run_total_ms": 0.0, "run_max_ms": 0.0,
+        })
+
+    async def enqueue(self, db: AsyncIOMotorDatabase, job_type: str, payload: Dict[str, Any], session=None) -> None:
+        """Persist a job; pass the caller's session to commit it atomically with the work that produced it.
+
+        Inside a transaction the job only becomes visible at commit, so the stats and the
+        worker wake-up are left to notify(), which the caller runs after the commit.
+        """
+        now = datetime.utcnow()
+        await db.jobs.insert_one({
+            "type": job_type,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "run_at": now,
+            "created_at": now,
+        }, session=session)
+        if session is None:
+            self.notify(job_type)
+
+    def notify(self, job_type: str) -> None:
+        """Count a newly visible job and wake the workers to claim it."""
+        self._type_stats(job_type)["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self, db: AsyncIOMotorDatabase, workers: int) -> None:
+        self._db = db
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(workers)]
+        logger.info(f"⚙️ Started {workers} job workers")
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await self._db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "run_at": {"$lte": now}},
+                {"status": "running", "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": "running", "locked_until": now + timedelta(seconds=settings.job_lease_seconds)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _worker(self, number: int) -> None:
+        await bind_caller_task()
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job worker {number} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.job_poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        stats = self._type_stats(job["type"])
+        stats["wait_total_ms"] += max((datetime.utcnow() - job["run_at"]).total_seconds(), 0) * 1000
+        handler = self._handlers.get(job["type"])
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job type {job['type']}")
+            # asyncio.timeout keeps the handler in this task, so its Mongo calls are attributed to it
+            async with asyncio.timeout(settings.job_lease_seconds):
+                await handler(self._db, job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._fail(job, e)
+            return
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats["run_total_ms"] += elapsed_ms
+            stats["run_max_ms"] = max(stats["run_max_ms"], elapsed_ms)
+
+        stats["succeeded"] += 1
+        await self._db.jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "done", "finished_at": datetime.utcnow()}, "$unset": {"locked_until": ""}},
+        )
+
+    async def _fail(self, job: Dict[str, Any], error: Exception) -> None:
+        stats = self._type_stats(job["type"])
+        if job["attempts"] >= settings.job_max_attempts:
+            stats["dead"] += 1
+            logger.error(f"💀 Job {job['_id']} ({job['type']}) dead-lettered after {job['attempts']} attempts: {error}")
+            update = {"status": "dead", "finished_at": datetime.utcnow(), "last_error": str(error)}
+        else:
+            stats["retried"] += 1
+            # Exponential backoff with jitter so a failing dependency is not hammered
+            delay = min(settings.job_retry_base_seconds * 2 ** (job["attempts"] - 1), settings.job_retry_max_seconds)
+            delay *= random.uniform(0.5, 1.0)
+            update = {"status": "pending", "run_at": datetime.utcnow() + timedelta(seconds=delay), "last_error": str(error)}
+        await self._db.jobs.update_one({"_id": job["_id"]}, {"$set": update, "$unset": {"locked_until": ""}})
+
+    async def get_stats(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        depth = {
+            status: await db.jobs.count_documents({"status": status})
+            for status in ("pending", "running", "dead")
+        }
+        per_type = {}
+        for job_type, stats in self.stats.items():
+            runs = stats["succeeded"] + stats["retried"] + stats["dead"]
+            per_type[job_type] = {
+                "enqueued": int(stats["enqueued"]),
+                "succeeded": int(stats["succeeded"]),
+                "retried": int(stats["retried"]),
+                "dead": int(stats["dead"]),
+                "avg_wait_ms": round(stats["wait_total_ms"] / runs, 3) if runs else 0.0,
+                "avg_run_ms": round(stats["run_total_ms"] / runs, 3) if runs else 0.0,
+                "max_run_ms": round(stats["run_max_ms"], 3),
+            }
+        return {"workers": len(self._workers), "depth": depth, "jobs": per_type}
+
+
+# Global instance
+job_queue = JobQueue()
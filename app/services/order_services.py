@@ -1,61 +1,301 @@
+import asyncio
+import logging
 from bson import ObjectId
-from pymongo.collection import Collection
 from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
 from datetime import datetime
-from typing import Dict, List
-from app.api_schemas.order import OrderOut
-from app.api_schemas.product import ProductOut
-
-def place_order(
-    carts_collection: Collection,
-    products_collection: Collection,
-    orders_collection: Collection,
-    user_id: str
-) -> OrderOut:
-    cart = carts_collection.find_one({"user_id": user_id})
-    if not cart or not cart.get("items"):
-        raise HTTPException(status_code=400, detail="Cart is empty")
+from typing import Callable, Dict, List, Optional, Tuple
+from app.api_schemas.order import OrderDetailOut, OrderItemOut, OrderOut, OrderPage, OrderSummaryOut, ProductSalesOut
+from app.services.job_services import job_queue
+from app.services.product_services import invalidate_products
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_condition
 
-    total = 0.0
-    product_ids: List[str] = []
+logger = logging.getLogger(__name__)
 
-    for item in cart["items"]:
-        product_id = item["product_id"]
-        quantity = item["quantity"]
+# Error code a standalone mongod returns when a multi-document transaction is attempted
+ILLEGAL_OPERATION = 20
 
+# Order history paging
+DEFAULT_ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+ORDER_SUMMARY_PROJECTION = {"total_price": 1, "status": 1, "created_at": 1}
+
+# Flipped off after the first failed transaction so standalone servers skip straight to compensation
+_transactions_supported = True
+
+def _merge_cart_quantities(items: List[Dict]) -> Dict[str, int]:
+    quantities: Dict[str, int] = {}
+    for item in items:
+        product_id = item["product_id"]
         if not ObjectId.is_valid(product_id):
             raise HTTPException(status_code=400, detail="Invalid product ID")
+        quantities[product_id] = quantities.get(product_id, 0) + item["quantity"]
+    return quantities
 
-        product = products_collection.find_one({"_id": ObjectId(product_id)})
-        if not product or product["quantity"] < quantity:
+def _reserve_update(product_id: str, quantity: int) -> Tuple[Dict, Dict]:
+    # The quantity guard makes the check-and-decrement a single atomic operation
+    return (
+        {"_id": ObjectId(product_id), "quantity": {"$gte": quantity}},
+        {"$inc": {"quantity": -quantity}}
+    )
+
+async def _release_stock(db: AsyncIOMotorDatabase, quantities: Dict[str, int]) -> None:
+    if not quantities:
+        return
+    await db.products.bulk_write(
+        [UpdateOne({"_id": ObjectId(pid)}, {"$inc": {"quantity": qty}}) for pid, qty in quantities.items()],
+        ordered=False
+    )
+
+def _order_placed_payload(order_data: Dict) -> Dict:
+    return {
+        "order_id": str(order_data["_id"]),
+        "user_id": order_data["user_id"],
+        "total_price": order_data["total_price"],
+    }
+
+@job_queue.handler("order.placed")
+async def _order_placed_job(db: AsyncIOMotorDatabase, payload: Dict) -> None:
+    # Hook for confirmation e-mails and other notifications; must be safe to run more than once
+    logger.info(f"📦 Order {payload['order_id']} placed by {payload['user_id']} for {payload['total_price']}")
+
+def _cart_changed() -> HTTPException:
+    return HTTPException(status_code=409, detail="Cart changed during checkout, please review it and try again")
+
+async def _checkout_in_transaction(db: AsyncIOMotorDatabase, cart: Dict, quantities: Dict[str, int], order_data: Dict, order_items: List[Dict]) -> None:
+    async def reserve_and_insert(session) -> Callable[[], None]:
+        # Claim the cart first and only in the state it was priced in. A concurrent checkout of the
+        # same cart either conflicts here or, when with_transaction re-runs this callback, finds it empty
+        claimed = await db.cart.find_one_and_update(
+            {"_id": cart["_id"], "items": cart["items"]},
+            {"$set": {"items": []}},
+            projection={"_id": 1},
+            session=session
+        )
+        if claimed is None:
+            raise _cart_changed()
+
+        result = await db.products.bulk_write(
+            [UpdateOne(*_reserve_update(pid, qty)) for pid, qty in quantities.items()],
+            ordered=False,
+            session=session
+        )
+        if result.modified_count != len(quantities):
+            # Raising aborts the transaction, undoing every decrement in this bulk
             raise HTTPException(status_code=400, detail="Not enough stock for one or more products")
 
-        total += product["price"] * quantity
+        await db.orders.insert_one(order_data, session=session)
+        await db.order_items.insert_many(order_items, ordered=False, session=session)
+        await job_queue.enqueue(db, "order.placed", _order_placed_payload(order_data), session=session)
+        # Run only after the commit: a retried callback or an aborted checkout must not count the job
+        return lambda: job_queue.notify("order.placed")
+
+    async with await db.client.start_session() as session:
+        on_commit = await session.with_transaction(reserve_and_insert)
+    on_commit()
+
+async def _checkout_with_compensation(db: AsyncIOMotorDatabase, cart: Dict, quantities: Dict[str, int], order_data: Dict, order_items: List[Dict]) -> None:
+    # Without a session the guarded decrements are issued concurrently and rolled back by hand
+    results = await asyncio.gather(
+        *(db.products.update_one(*_reserve_update(pid, qty)) for pid, qty in quantities.items()),
+        return_exceptions=True
+    )
+    reserved = {
+        pid: qty
+        for (pid, qty), result in zip(quantities.items(), results)
+        if not isinstance(result, BaseException) and result.modified_count == 1
+    }
+    if len(reserved) != len(quantities):
+        await _release_stock(db, reserved)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        raise HTTPException(status_code=400, detail="Not enough stock for one or more products")
 
-        # Update product quantity
-        products_collection.update_one(
-            {"_id": ObjectId(product_id)},
-            {"$inc": {"quantity": -quantity}}
+    try:
+        await db.orders.insert_one(order_data)
+        await db.order_items.insert_many(order_items, ordered=False)
+        # The cart is cleared only in the state it was priced in; of two concurrent checkouts
+        # of the same cart exactly one gets past this point, the other is rolled back
+        claimed = await db.cart.find_one_and_update(
+            {"_id": cart["_id"], "items": cart["items"]},
+            {"$set": {"items": []}},
+            projection={"_id": 1}
         )
+        if claimed is None:
+            raise _cart_changed()
+    except Exception:
+        await db.order_items.delete_many({"order_id": order_data["_id"]})
+        await db.orders.delete_one({"_id": order_data["_id"]})
+        await _release_stock(db, reserved)
+        raise
 
-        product_ids.append(product_id)
+    # The order is committed; a failed notification must not turn it into an error for the client
+    try:
+        await job_queue.enqueue(db, "order.placed", _order_placed_payload(order_data))
+    except PyMongoError as e:
+        logger.warning(f"Could not enqueue order.placed for {order_data['_id']}: {e}")
 
-    # Create order
+async def place_order(db: AsyncIOMotorDatabase, user_id: str) -> OrderOut:
+    global _transactions_supported
+
+    cart = await db.cart.find_one({"user_id": user_id})
+    if not cart or not cart.get("items"):
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    quantities = _merge_cart_quantities(cart["items"])
+
+    # One round-trip for every price in the cart
+    prices: Dict[str, float] = {}
+    categories: Dict[str, Optional[str]] = {}
+    cursor = db.products.find({"_id": {"$in": [ObjectId(pid) for pid in quantities]}}, {"price": 1, "category": 1})
+    async for product in cursor:
+        prices[str(product["_id"])] = product["price"]
+        categories[str(product["_id"])] = product.get("category")
+    missing = sorted(pid for pid in quantities if pid not in prices)
+    if missing:
+        # Products deleted since they were added; drop their lines so a retry can go through
+        await db.cart.update_one({"_id": cart["_id"]}, {"$pull": {"items": {"product_id": {"$in": missing}}}})
+        raise HTTPException(status_code=409, detail=f"Products no longer available: {', '.join(missing)}")
+
+    # Cart lines carry the price the customer saw; refuse to charge a different one silently
+    changed = sorted({
+        item["product_id"] for item in cart["items"]
+        if item.get("unit_price") is not None and item["unit_price"] != prices[item["product_id"]]
+    })
+    if changed:
+        await db.cart.bulk_write([
+            UpdateOne({"_id": cart["_id"], "items.product_id": pid}, {"$set": {"items.$.unit_price": prices[pid]}})
+            for pid in changed
+        ], ordered=False)
+        raise HTTPException(status_code=409, detail=f"Prices changed for products: {', '.join(changed)}")
+
+    product_ids: List[str] = [item["product_id"] for item in cart["items"]]
+    total = sum(prices[pid] * qty for pid, qty in quantities.items())
+
+    # Mongo stores milliseconds; truncate so the response matches what later reads and replays return
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+    # Create order; the _id is assigned up front so line items can reference it in the same unit
     order_data = {
+        "_id": ObjectId(),
         "user_id": user_id,
         "product_ids": product_ids,
         "total_price": total,
         "status": "pending",
-        "created_at": datetime.utcnow()
+        "created_at": now
     }
+    order_items = [
+        {
+            "order_id": order_data["_id"],
+            "product_id": ObjectId(pid),
+            "user_id": user_id,
+            "quantity": qty,
+            "unit_price": prices[pid],
+            "line_total": prices[pid] * qty,
+            "category": categories[pid],
+            "created_at": now,
+        }
+        for pid, qty in quantities.items()
+    ]
 
-    result = orders_collection.insert_one(order_data)
-    order_data["_id"] = result.inserted_id
+    if _transactions_supported:
+        try:
+            await _checkout_in_transaction(db, cart, quantities, order_data, order_items)
+        except OperationFailure as e:
+            if e.code != ILLEGAL_OPERATION:
+                raise
+            logger.warning("Transactions unavailable, falling back to compensating checkout: %s", e)
+            _transactions_supported = False
+            await _checkout_with_compensation(db, cart, quantities, order_data, order_items)
+    else:
+        await _checkout_with_compensation(db, cart, quantities, order_data, order_items)
 
-    # Clear cart
-    carts_collection.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": []}}
-    )
+    # Stock levels changed, so cached product reads are stale
+    invalidate_products(quantities)
 
     return OrderOut(**order_data, id=str(order_data["_id"]))
+
+async def get_order(db: AsyncIOMotorDatabase, user_id: str, order_id: str) -> OrderDetailOut:
+    if not ObjectId.is_valid(order_id):
+        raise HTTPException(status_code=400, detail="Invalid order ID")
+    # The order and its line items come back in one round-trip; the $lookup uses order_items_order_idx
+    pipeline = [
+        {"$match": {"_id": ObjectId(order_id), "user_id": user_id}},
+        {"$lookup": {"from": "order_items", "localField": "_id", "foreignField": "order_id", "as": "items"}},
+    ]
+    docs = await db.orders.aggregate(pipeline).to_list(length=1)
+    if not docs:
+        raise HTTPException(status_code=404, detail="Order not found")
+    order = docs[0]
+    items = [
+        OrderItemOut(
+            product_id=str(item["product_id"]),
+            quantity=item["quantity"],
+            unit_price=item["unit_price"],
+            line_total=item["line_total"],
+        )
+        for item in order.pop("items")
+    ]
+    return OrderDetailOut(**order, id=str(order["_id"]), items=items)
+
+async def get_product_sales(db: AsyncIOMotorDatabase, product_id: str) -> ProductSalesOut:
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
+    # Equality on product_id is served by order_items_product_idx
+    pipeline = [
+        {"$match": {"product_id": ObjectId(product_id)}},
+        {"$group": {
+            "_id": None,
+            "units_sold": {"$sum": "$quantity"},
+            "revenue": {"$sum": "$line_total"},
+            "orders": {"$sum": 1},
+        }},
+    ]
+    rows = await db.order_items.aggregate(pipeline).to_list(length=1)
+    totals = rows[0] if rows else {"units_sold": 0, "revenue": 0.0, "orders": 0}
+    return ProductSalesOut(
+        product_id=product_id,
+        units_sold=totals["units_sold"],
+        revenue=totals["revenue"],
+        orders=totals["orders"],
+    )
+
+async def list_orders(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    limit: int = DEFAULT_ORDER_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+) -> OrderPage:
+    """Newest-first order history, one index range scan per page however many orders the user has."""
+    limit = max(1, min(limit, MAX_ORDER_PAGE_SIZE))
+    conditions: List[Dict] = [{"user_id": user_id}]
+    if status is not None:
+        conditions.append({"status": status})
+    if cursor:
+        value, last_id = decode_cursor(cursor, "orders")
+        conditions.append(keyset_condition("created_at", DESCENDING, value, last_id))
+
+    # user_orders_date_idx (user_id, created_at desc, _id desc) supplies both the range and the order.
+    # No hint on purpose: a hint naming a missing index fails the query, and history must keep
+    # working on a database whose indexes are still being built
+    docs = await (
+        db.orders.find({"$and": conditions}, ORDER_SUMMARY_PROJECTION)
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor("orders", docs[-1]["created_at"], docs[-1]["_id"])
+
+    return OrderPage(
+        items=[OrderSummaryOut(**doc, id=str(doc["_id"])) for doc in docs],
+        next_cursor=next_cursor,
+    )
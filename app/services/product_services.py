@@ -1,7 +1,58 @@
-from pymongo import MongoClient
+import asyncio
+import csv
+import io
+import json
+import logging
 from bson import ObjectId
+from datetime import datetime, timedelta
 from fastapi import HTTPException
-from app.api_schemas.product import ProductCreate, ProductOut
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.api_schemas.product import (
+    AutocompleteSuggestion, ProductCreate, ProductOut, ProductPage, ProductSearchPage, ProductSearchFacets, CategoryFacet, PriceBucketFacet,
+)
+from app.utils.cache import TTLCache
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_condition
+from app.utils.prefix_index import PrefixIndex
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Listing sort orders: name -> (sort field, direction). _id is always the tiebreaker.
+PRODUCT_SORTS: Dict[str, Tuple[str, int]] = {
+    "newest": ("created_at", DESCENDING),
+    "price_asc": ("price", ASCENDING),
+    "price_desc": ("price", DESCENDING),
+}
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Catalog export: fields partners may request and the cursor batch size bounds
+EXPORT_FIELDS = ["id", "name", "description", "price", "quantity", "category", "image_url", "created_at"]
+DEFAULT_EXPORT_BATCH_SIZE = 1000
+MAX_EXPORT_BATCH_SIZE = 10000
+
+# Search: lower bounds of the price facet buckets; prices above the last bound share one bucket
+PRICE_BUCKET_BOUNDARIES = [0, 10, 25, 50, 100, 250, 500, 1000]
+MAX_SEARCH_PAGE = 50
+
+# Fields ProductOut is built from; used to keep batched lookups narrow
+PRODUCT_OUT_PROJECTION = {field: 1 for field in ProductOut.model_fields if field != "id"}
+
+# Read-through cache of ProductOut keyed by product id string
+product_cache = TTLCache(maxsize=settings.product_cache_max_entries, ttl=settings.product_cache_ttl_seconds)
+
+# Concurrent identical product reads share one in-flight Mongo query
+product_reads = SingleFlight()
+
+# Search-as-you-type over product names and categories, served without touching Mongo
+product_autocomplete = PrefixIndex(max_entries=settings.autocomplete_max_entries)
+# Newest created_at folded into the prefix index; None until the first full build
+_autocomplete_watermark: Optional[datetime] = None
+AUTOCOMPLETE_REFRESH_OVERLAP = timedelta(seconds=60)
 
 # Utility function to convert MongoDB document to Pydantic model
 def product_out_from_doc(doc: dict) -> ProductOut:
@@ -10,25 +61,297 @@ def product_out_from_doc(doc: dict) -> ProductOut:
     doc.pop("_id", None)
     return ProductOut.model_validate(doc)
 
-async def create_product(db, data: ProductCreate) -> ProductOut:
+def invalidate_products(product_ids: Iterable[str]) -> None:
+    for product_id in product_ids:
+        product_cache.invalidate(product_id)
+
+async def create_product(db: AsyncIOMotorDatabase, data: ProductCreate) -> ProductOut:
     # data is a Pydantic model; convert to dict and insert
     product_dict = data.model_dump()
-    result = db.products.insert_one(product_dict)  # Insert into 'products' collection
-    product_doc = db.products.find_one({"_id": result.inserted_id})
-    return product_out_from_doc(product_doc)
+    product_dict["created_at"] = datetime.utcnow()
+    # Cart line snapshots compare against this; catalog edits must $inc it
+    product_dict["version"] = 1
+    result = await db.products.insert_one(product_dict)  # Insert into 'products' collection
+    product_doc = await db.products.find_one({"_id": result.inserted_id})
+    invalidate_products([str(result.inserted_id)])
+    product = product_out_from_doc(product_doc)
+    _index_for_autocomplete(product.name, product.category, product.id)
+    return product
 
-async def get_product(db, product_id: str) -> ProductOut:
+async def get_product(db: AsyncIOMotorDatabase, product_id: str) -> ProductOut:
     # Validate ObjectId format
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product ID format")
-    product_doc = db.products.find_one({"_id": ObjectId(product_id)})
+    product = product_cache.get(product_id)
+    if product is not None:
+        return product
+    return await product_reads.do(("product", product_id), lambda: _load_product(db, product_id))
+
+async def _load_product(db: AsyncIOMotorDatabase, product_id: str) -> ProductOut:
+    product_doc = await db.products.find_one({"_id": ObjectId(product_id)})
     if not product_doc:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product_out_from_doc(product_doc)
+    product = product_out_from_doc(product_doc)
+    product_cache.set(product_id, product)
+    return product
 
-async def list_products(db) -> list[ProductOut]:
-    cursor = db.products.find()
-    products = []
-    async for doc in cursor:  # pymongo does NOT support async, so you can remove async here
-        products.append(product_out_from_doc(doc))
+async def get_products_by_ids(db: AsyncIOMotorDatabase, product_ids: Iterable[str]) -> Dict[str, ProductOut]:
+    """Resolve many products at once: cache first, then a single $in query for the misses."""
+    products: Dict[str, ProductOut] = {}
+    missing: List[ObjectId] = []
+    for product_id in dict.fromkeys(product_ids):
+        cached = product_cache.get(product_id)
+        if cached is not None:
+            products[product_id] = cached
+        elif ObjectId.is_valid(product_id):
+            missing.append(ObjectId(product_id))
+
+    if missing:
+        async for doc in db.products.find({"_id": {"$in": missing}}, PRODUCT_OUT_PROJECTION):
+            product = product_out_from_doc(doc)
+            product_cache.set(product.id, product)
+            products[product.id] = product
     return products
+
+async def list_products(
+    db: AsyncIOMotorDatabase,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: str = "newest",
+) -> ProductPage:
+    if sort not in PRODUCT_SORTS:
+        raise HTTPException(status_code=400, detail="Invalid sort order")
+    field, direction = PRODUCT_SORTS[sort]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # Equality on category first, then the range on price or the created_at order, so
+    # category_price_idx / category_created_idx apply
+    conditions: list[Dict] = []
+    if category is not None:
+        conditions.append({"category": category})
+    price_range: Dict[str, float] = {}
+    if min_price is not None:
+        price_range["$gte"] = min_price
+    if max_price is not None:
+        price_range["$lte"] = max_price
+    if price_range:
+        conditions.append({"price": price_range})
+
+    # Keyset: resume strictly after the last (field, _id) pair of the previous page
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        conditions.append(keyset_condition(field, direction, value, last_id))
+
+    query = {"$and": conditions} if conditions else {}
+
+    async def load_page() -> ProductPage:
+        docs = await db.products.find(query).sort([(field, direction), ("_id", direction)]).limit(limit + 1).to_list(length=limit + 1)
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            last = docs[-1]
+            next_cursor = encode_cursor(sort, last.get(field), last["_id"])
+
+        return ProductPage(items=[product_out_from_doc(doc) for doc in docs], next_cursor=next_cursor)
+
+    key = ("list", sort, limit, cursor, category, min_price, max_price)
+    return await product_reads.do(key, load_page)
+
+async def backfill_product_created_at(db: AsyncIOMotorDatabase) -> int:
+    """Stamp products created before created_at was recorded with their ObjectId time.
+
+    Undated products sort after every dated one under "newest", and no keyset cursor taken
+    from a dated page can reach them. Startup task; idempotent, so every worker may run it.
+    """
+    try:
+        # Matches missing and null; served by product_created_idx
+        result = await db.products.update_many({"created_at": None}, [{"$set": {"created_at": {"$toDate": "$_id"}}}])
+    except PyMongoError as e:
+        logger.warning(f"created_at backfill failed: {e}")
+        return 0
+    if result.modified_count:
+        logger.info(f"🕒 Backfilled created_at on {result.modified_count} products")
+    return result.modified_count
+
+async def search_products(
+    db: AsyncIOMotorDatabase,
+    q: str,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    page: int = 1,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> ProductSearchPage:
+    """Relevance-ranked text search with category and price facets in a single aggregation."""
+    page = max(1, min(page, MAX_SEARCH_PAGE))
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    # $text must lead the pipeline so the search_text index is used
+    match: Dict[str, Any] = {"$text": {"$search": q}}
+    price_range: Dict[str, float] = {}
+    if min_price is not None:
+        price_range["$gte"] = min_price
+    if max_price is not None:
+        price_range["$lte"] = max_price
+    if price_range:
+        match["price"] = price_range
+
+    # The category facet ignores the category filter so clients can see the alternatives
+    category_match = [{"$match": {"category": category}}] if category is not None else []
+
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$facet": {
+            "results": category_match + [
+                {"$sort": {"score": -1, "_id": 1}},
+                {"$skip": (page - 1) * page_size},
+                {"$limit": page_size},
+                {"$project": PRODUCT_OUT_PROJECTION},
+            ],
+            "total": category_match + [{"$count": "count"}],
+            "categories": [{"$sortByCount": "$category"}],
+            "price_buckets": category_match + [{"$bucket": {
+                "groupBy": "$price",
+                "boundaries": PRICE_BUCKET_BOUNDARIES + [float("inf")],
+                "default": "other",
+                "output": {"count": {"$sum": 1}},
+            }}],
+        }},
+    ]
+
+    facets = (await db.products.aggregate(pipeline).to_list(length=1))[0]
+
+    # Buckets are keyed by their lower bound; the open-ended top bucket has no max_price
+    upper_bounds = dict(zip(PRICE_BUCKET_BOUNDARIES, PRICE_BUCKET_BOUNDARIES[1:]))
+    price_buckets = [
+        PriceBucketFacet(min_price=bucket["_id"], max_price=upper_bounds.get(bucket["_id"]), count=bucket["count"])
+        for bucket in facets["price_buckets"]
+        if bucket["_id"] != "other"
+    ]
+
+    return ProductSearchPage(
+        items=[product_out_from_doc(doc) for doc in facets["results"]],
+        total=facets["total"][0]["count"] if facets["total"] else 0,
+        page=page,
+        page_size=page_size,
+        facets=ProductSearchFacets(
+            categories=[CategoryFacet(category=row["_id"], count=row["count"]) for row in facets["categories"]],
+            price_buckets=price_buckets,
+        ),
+    )
+
+def _index_for_autocomplete(name: Optional[str], category: Optional[str], product_id: str) -> None:
+    if name:
+        product_autocomplete.add(name, "product", product_id)
+    if category:
+        product_autocomplete.add(category, "category")
+
+async def build_autocomplete_index(db: AsyncIOMotorDatabase) -> None:
+    """Load product names and categories into the prefix index (full scan, run once at startup)."""
+    global _autocomplete_watermark
+    items: List[Tuple[str, str, Optional[str]]] = []
+    categories = set()
+    watermark: Optional[datetime] = None
+    async for doc in db.products.find({}, {"name": 1, "category": 1, "created_at": 1}, batch_size=DEFAULT_EXPORT_BATCH_SIZE):
+        if doc.get("name"):
+            items.append((doc["name"], "product", str(doc["_id"])))
+        if doc.get("category"):
+            categories.add(doc["category"])
+        if doc.get("created_at") and (watermark is None or doc["created_at"] > watermark):
+            watermark = doc["created_at"]
+    # Categories go first so they survive the entry cap on very large catalogs
+    product_autocomplete.build([(category, "category", None) for category in sorted(categories)] + items)
+    _autocomplete_watermark = watermark or datetime.utcnow()
+    logger.info(f"🔤 Autocomplete index built: {product_autocomplete.stats()}")
+
+async def refresh_autocomplete_index(db: AsyncIOMotorDatabase) -> int:
+    """Add products created since the last scan, including those created through other workers."""
+    global _autocomplete_watermark
+    # Re-read an overlap window: inserts from other workers may commit slightly out of created_at order.
+    # Re-adding a product already indexed is a no-op in PrefixIndex
+    since = _autocomplete_watermark - AUTOCOMPLETE_REFRESH_OVERLAP
+    added = 0
+    cursor = db.products.find(
+        {"created_at": {"$gte": since}},
+        {"name": 1, "category": 1, "created_at": 1},
+    ).sort([("created_at", ASCENDING), ("_id", ASCENDING)])
+    async for doc in cursor:
+        _index_for_autocomplete(doc.get("name"), doc.get("category"), str(doc["_id"]))
+        _autocomplete_watermark = max(_autocomplete_watermark, doc["created_at"])
+        added += 1
+    return added
+
+async def autocomplete_refresh_loop(db: AsyncIOMotorDatabase, interval: float) -> None:
+    """Background task: one full build, then incremental refreshes by created_at watermark."""
+    while True:
+        try:
+            if _autocomplete_watermark is None:
+                await build_autocomplete_index(db)
+            else:
+                await refresh_autocomplete_index(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Autocomplete refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+def autocomplete_products(q: str, limit: int = 10) -> List[AutocompleteSuggestion]:
+    return [
+        AutocompleteSuggestion(text=text, kind=kind, product_id=ref)
+        for text, kind, ref in product_autocomplete.search(q, limit)
+    ]
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+async def export_products(
+    db: AsyncIOMotorDatabase,
+    fmt: str = "ndjson",
+    fields: Optional[List[str]] = None,
+    batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+) -> AsyncIterator[str]:
+    """Stream the catalog batch by batch; only one cursor batch is held in memory at a time."""
+    fields = fields or EXPORT_FIELDS
+    projection = {("_id" if field == "id" else field): 1 for field in fields}
+    if "id" not in fields:
+        projection["_id"] = 0
+    batch_size = max(1, min(batch_size, MAX_EXPORT_BATCH_SIZE))
+    cursor = db.products.find({}, projection, batch_size=batch_size).sort("_id", ASCENDING)
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    else:
+        writer = None
+
+    # Rows are flushed once per cursor batch rather than once per document
+    chunk: List[str] = []
+    async for doc in cursor:
+        if "_id" in doc:
+            doc["id"] = doc.pop("_id")
+        row = [_export_value(doc.get(field)) for field in fields]
+        if writer is None:
+            chunk.append(json.dumps(dict(zip(fields, row))) + "\n")
+        else:
+            writer.writerow(row)
+            chunk.append(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.api_schemas.report import CategorySalesOut, DailySalesOut, ProductSalesSummaryOut
+from app.utils.mongo_monitoring import bind_caller_task
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STATE_ID = "sales"
+DAY_FORMAT = "%Y-%m-%d"
+
+def _day_expr(field: str) -> Dict[str, Any]:
+    return {"$dateToString": {"format": DAY_FORMAT, "date": f"${field}", "timezone": "UTC"}}
+
+def _merge_into(collection: str, counters: List[str], window_end: datetime) -> Dict[str, Any]:
+    """Add this window's counts to existing day rows.
+
+    Every row remembers the end of the last window folded into it, so a window that is
+    retried after a partial failure is not counted twice.
+    """
+    return {"$merge": {
+        "into": collection,
+        "on": "_id",
+        "whenMatched": [{"$set": {
+            **{
+                counter: {"$cond": [
+                    {"$lt": [{"$ifNull": ["$applied_until", None]}, window_end]},
+                    {"$add": [{"$ifNull": [f"${counter}", 0]}, f"$$new.{counter}"]},
+                    f"${counter}",
+                ]}
+                for counter in counters
+            },
+            "applied_until": {"$max": ["$applied_until", window_end]},
+            "updated_at": "$$new.updated_at",
+        }}],
+        "whenNotMatched": "insert",
+    }}
+
+async def run_sales_rollup(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """Fold orders created in [watermark, until) into the daily summary collections.
+
+    Each run reads only the orders and line items of its own window (through
+    order_created_idx and order_items_created_idx) and adds them to the day rows with
+    $merge, so its cost follows the number of new orders, not the day's volume.
+    """
+    candidate = datetime.utcnow() - timedelta(seconds=settings.sales_rollup_lag_seconds)
+    # Workers agree on one window: a window left pending (by a failed or concurrent run) is
+    # reused exactly, never widened, and the per-row applied_until makes re-merging it a no-op
+    state = await db.rollup_state.find_one_and_update(
+        {"_id": ROLLUP_STATE_ID},
+        [{"$set": {"pending_until": {"$ifNull": ["$pending_until", candidate]}}}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    watermark: Optional[datetime] = state.get("watermark")
+    until: datetime = state["pending_until"]
+    if watermark is not None and watermark >= until:
+        await db.rollup_state.update_one({"_id": ROLLUP_STATE_ID, "pending_until": until}, {"$unset": {"pending_until": ""}})
+        return {"watermark": watermark, "skipped": True}
+
+    window: Dict[str, Any] = {"$lt": until}
+    if watermark is not None:
+        window["$gte"] = watermark
+    now = datetime.utcnow()
+
+    await db.orders.aggregate([
+        {"$match": {"created_at": window}},
+        {"$group": {"_id": _day_expr("created_at"), "orders": {"$sum": 1}, "revenue": {"$sum": "$total_price"}}},
+        {"$set": {"day": "$_id", "applied_until": until, "updated_at": now}},
+        _merge_into("sales_daily", ["orders", "revenue"], until),
+    ]).to_list(length=None)
+
+    await db.order_items.aggregate([
+        {"$match": {"created_at": window}},
+        {"$group": {
+            "_id": {"day": _day_expr("created_at"), "category": {"$ifNull": ["$category", None]}},
+            "units": {"$sum": "$quantity"},
+            "revenue": {"$sum": "$line_total"},
+        }},
+        {"$set": {"day": "$_id.day", "category": "$_id.category", "applied_until": until, "updated_at": now}},
+        _merge_into("sales_daily_category", ["units", "revenue"], until),
+    ]).to_list(length=None)
+
+    await db.order_items.aggregate([
+        {"$match": {"created_at": window}},
+        {"$group": {
+            "_id": {"day": _day_expr("created_at"), "product_id": "$product_id"},
+            "units": {"$sum": "$quantity"},
+            "revenue": {"$sum": "$line_total"},
+        }},
+        {"$set": {"day": "$_id.day", "product_id": "$_id.product_id", "applied_until": until, "updated_at": now}},
+        _merge_into("sales_daily_product", ["units", "revenue"], until),
+    ]).to_list(length=None)
+
+    await db.rollup_state.update_one(
+        {"_id": ROLLUP_STATE_ID, "pending_until": until},
+        {"$set": {"watermark": until, "last_run_at": now}, "$unset": {"pending_until": ""}},
+    )
+    logger.info(f"📊 Sales rollup advanced to {until.isoformat()}")
+    return {"watermark": until, "skipped": False}
+
+async def sales_rollup_loop(db: AsyncIOMotorDatabase, interval: float) -> None:
+    """Background task for the in-app schedule; failures are logged and retried next tick."""
+    await bind_caller_task()
+    while True:
+        try:
+            await run_sales_rollup(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Sales rollup failed: {e}")
+        await asyncio.sleep(interval)
+
+def _day_range(start: Optional[date], end: Optional[date], field: str = "day") -> Dict[str, Any]:
+    day_range: Dict[str, Any] = {}
+    if start is not None:
+        day_range["$gte"] = start.strftime(DAY_FORMAT)
+    if end is not None:
+        day_range["$lte"] = end.strftime(DAY_FORMAT)
+    return {field: day_range} if day_range else {}
+
+async def get_daily_sales(db: AsyncIOMotorDatabase, start: Optional[date], end: Optional[date]) -> List[DailySalesOut]:
+    # sales_daily is keyed by the day itself, so the range runs on the _id index
+    cursor = db.sales_daily.find(_day_range(start, end, "_id"), {"day": 1, "orders": 1, "revenue": 1}).sort("_id", 1)
+    return [DailySalesOut(**doc) async for doc in cursor]
+
+async def get_category_sales(db: AsyncIOMotorDatabase, start: Optional[date], end: Optional[date]) -> List[CategorySalesOut]:
+    rows = await db.sales_daily_category.aggregate([
+        {"$match": _day_range(start, end)},
+        {"$group": {"_id": "$category", "units": {"$sum": "$units"}, "revenue": {"$sum": "$revenue"}}},
+        {"$sort": {"revenue": -1}},
+    ]).to_list(length=None)
+    return [CategorySalesOut(category=row["_id"], units=row["units"], revenue=row["revenue"]) for row in rows]
+
+async def get_top_products(db: AsyncIOMotorDatabase, start: Optional[date], end: Optional[date], limit: int = 20) -> List[ProductSalesSummaryOut]:
+    rows = await db.sales_daily_product.aggregate([
+        {"$match": _day_range(start, end)},
+        {"$group": {"_id": "$product_id", "units": {"$sum": "$units"}, "revenue": {"$sum": "$revenue"}}},
+        {"$sort": {"revenue": -1}},
+        {"$limit": limit},
+    ]).to_list(length=None)
+    return [ProductSalesSummaryOut(product_id=str(row["_id"]), units=row["units"], revenue=row["revenue"]) for row in rows]
+
+if __name__ == "__main__":
+    # CLI entry point for cron/deploy jobs: python -m app.services.report_services
+    from app.database import database
+
+    if not database.connect():
+        raise SystemExit(1)
+    try:
+        result = asyncio.run(run_sales_rollup(database.async_db))
+        print(result)
+    finally:
+        database.disconnect()
@@ -1,14 +1,67 @@
 # services/user_service.py
 # from odmantic import AIOEngine
+import time
 from typing import Optional
-from app.models.user import User
+from uuid import UUID
+from app.config import settings
+from app.models.user import User, UserRole
 from app.api_schemas.user import UserCreate, UserOut, UserUpdate
-from fastapi import HTTPException, Depends
-from app.utils.auth import hash_password , verify_password
+from fastapi import HTTPException, Depends, status
+from app.utils.auth import InvalidTokenError, hash_password_async, verify_password_async, decode_access_token
+from app.utils.cache import TTLCache
 from fastapi.security import OAuth2PasswordBearer
 
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+# The auth router is mounted at /api/auth and carries its own /auth prefix
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/auth/login")
+
+# Decoded JWT claims keyed by raw token, and User records keyed by user_Id
+token_claims_cache = TTLCache(maxsize=settings.auth_cache_max_entries, ttl=settings.auth_cache_ttl_seconds)
+current_user_cache = TTLCache(maxsize=settings.auth_cache_max_entries, ttl=settings.auth_cache_ttl_seconds)
+
+def _credentials_exception(detail: str = "Could not validate credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """Resolve the authenticated user, skipping the JWT decode and user lookup when cached."""
+    claims = token_claims_cache.get(token)
+    if claims is None:
+        try:
+            claims = decode_access_token(token)
+        except InvalidTokenError:
+            raise _credentials_exception()
+        token_claims_cache.set(token, claims)
+    # Cached claims may outlive the token itself
+    if claims.get("exp") is not None and claims["exp"] < time.time():
+        token_claims_cache.invalidate(token)
+        raise _credentials_exception("Token has expired")
+
+    user_id = claims.get("sub")
+    if not user_id:
+        raise _credentials_exception()
+
+    user = current_user_cache.get(user_id)
+    if user is None:
+        try:
+            user = await UserServices.get_user_by_id(UUID(user_id))
+        except ValueError:
+            raise _credentials_exception()
+        if not user:
+            raise _credentials_exception()
+        current_user_cache.set(user_id, user)
+
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    return user
+
+async def get_current_admin(user: User = Depends(get_current_user)) -> User:
+    if user.role != UserRole.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return user
 
 class UserServices:
     @staticmethod
@@ -16,16 +69,17 @@ class UserServices:
         user_in = User(
             email=user.email,
             username=user.username,
-            hashed_password= hash_password(user.password)
+            fullName=user.fullName,
+            hashed_password=await hash_password_async(user.password)
         )
         await user_in.insert()
         return user_in
     @staticmethod
     async def authenticate_user(email: str , password: str) -> Optional[User]:
-        user = await User.by_email(email)
+        user = await User.find_one(User.email == email)
         if not user:
             return None
-        if not verify_password(password=password , hashed_password = user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
         return user
     @staticmethod
@@ -37,6 +91,7 @@ class UserServices:
         if not user:
             raise HTTPException(status_code=404 , detail="User not found")
         await user.update({"$set":data.dict(exclude_unset=True)})
+        current_user_cache.invalidate(str(user.user_Id))
         return user
     @staticmethod
     async def get_all_users():
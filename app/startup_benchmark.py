@@ -0,0 +1,95 @@
+import argparse
+import http.client
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# "import time: self [us] | cumulative | imported package" as printed by python -X importtime
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure_imports(target: str = "app.main") -> List[Tuple[str, float, float]]:
+    """Import the app in a fresh interpreter and return (module, self_ms, cumulative_ms) per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, module = match.groups()
+            modules.append((module, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get_status(port: int, path: str) -> Optional[int]:
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+        conn.request("GET", path)
+        return conn.getresponse().status
+    except OSError:
+        return None
+
+
+def measure_first_request(timeout: float) -> Dict[str, Optional[float]]:
+    """Start uvicorn and time how long /livez and /readyz take to first answer 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+    )
+    timings: Dict[str, Optional[float]] = {"/livez": None, "/readyz": None}
+    try:
+        while time.perf_counter() - started < timeout and None in timings.values():
+            if server.poll() is not None:
+                break
+            for path, elapsed in timings.items():
+                if elapsed is None and _get_status(port, path) == 200:
+                    timings[path] = round(time.perf_counter() - started, 3)
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report import time per module and time-to-first-request")
+    parser.add_argument("--top", type=int, default=20, help="slowest modules to list")
+    parser.add_argument("--no-server", action="store_true", help="skip the time-to-first-request measurement")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the server to answer")
+    args = parser.parse_args()
+
+    modules = measure_imports()
+    total_ms = next((cumulative for module, _, cumulative in modules if module == "app.main"), 0.0)
+    print(f"import app.main: {total_ms:.1f} ms")
+
+    print(f"\nSlowest {args.top} modules by cumulative import time:")
+    for module, self_ms, cumulative_ms in sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_ms:9.1f} ms  (self {self_ms:7.1f} ms)  {module}")
+
+    print("\nApp modules:")
+    for module, self_ms, cumulative_ms in modules:
+        if module.startswith("app."):
+            print(f"  {cumulative_ms:9.1f} ms  (self {self_ms:7.1f} ms)  {module}")
+
+    if not args.no_server:
+        timings = measure_first_request(args.timeout)
+        print("\nTime to first 200 from process start:")
+        for path, elapsed in timings.items():
+            print(f"  {path}: {'timed out' if elapsed is None else f'{elapsed:.3f} s'}")
+
+
+if __name__ == "__main__":
+    # python -m app.startup_benchmark [--top N] [--no-server]
+    main()
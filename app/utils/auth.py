@@ -1,33 +1,108 @@
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-import os
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from functools import lru_cache
+from typing import Any, Callable, Dict
+from app.config import settings
 
-load_dotenv()
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("HS256")
-SECRET_REFRESH_KEY = os.getenv("SECRET_REFRESH_KEY")
+class InvalidTokenError(ValueError):
+    """A JWT that failed to decode or verify."""
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# passlib and python-jose are imported on first use so they stay off the startup path
+@lru_cache(maxsize=None)
+def _pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=None)
+def _jwt():
+    from jose import jwt
+    return jwt
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return _pwd_context().verify(plain, hashed)
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+_hash_pending = 0
+_hash_stats: Dict[str, Dict[str, float]] = {
+    op: {"count": 0, "rejected": 0, "total_ms": 0.0, "max_ms": 0.0, "queue_total_ms": 0.0}
+    for op in ("hash", "verify")
+}
+
+def _timed(fn: Callable, *args) -> tuple[Any, float, float]:
+    started = time.perf_counter()
+    return fn(*args), started, time.perf_counter()
+
+async def _run_hashing(op: str, fn: Callable, *args) -> Any:
+    global _hash_pending
+    stats = _hash_stats[op]
+    # Admission control: shed load instead of letting a login storm queue up behind bcrypt
+    if _hash_pending >= settings.password_hash_max_pending:
+        stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    submitted = time.perf_counter()
+    try:
+        result, started, finished = await asyncio.get_running_loop().run_in_executor(_hash_executor, _timed, fn, *args)
+    finally:
+        _hash_pending -= 1
+    elapsed_ms = (finished - started) * 1000
+    stats["count"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    stats["queue_total_ms"] += (started - submitted) * 1000
+    return result
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing("hash", hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_hashing("verify", verify_password, plain, hashed)
+
+def password_hashing_stats() -> Dict[str, Any]:
+    operations = {}
+    for op, stats in _hash_stats.items():
+        count = stats["count"]
+        operations[op] = {
+            "count": int(count),
+            "rejected": int(stats["rejected"]),
+            "avg_ms": round(stats["total_ms"] / count, 3) if count else 0.0,
+            "max_ms": round(stats["max_ms"], 3),
+            "avg_queue_ms": round(stats["queue_total_ms"] / count, 3) if count else 0.0,
+        }
+    return {
+        "workers": settings.password_hash_workers,
+        "max_pending": settings.password_hash_max_pending,
+        "pending": _hash_pending,
+        "operations": operations,
+    }
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return _jwt().encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
 def decode_access_token(token: str):
-    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    from jose import JWTError
+    try:
+        return _jwt().decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError as e:
+        raise InvalidTokenError(str(e)) from e
 
 def create_refresh_token(subject: str) -> str:
     expires = datetime.now() + timedelta(days=7)
     to_encode = {"sub":subject , "exp": int(expires.timestamp())}
-    return jwt.encode(to_encode,SECRET_REFRESH_KEY , algorithm=ALGORITHM)
+    return _jwt().encode(to_encode, settings.secret_refresh_key, algorithm=settings.algorithm)
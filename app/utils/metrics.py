@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds / bytes; an implicit +Inf bucket follows the last one
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    """One labelled series: a fixed array of bucket counts plus the running sum."""
+
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...], lock: threading.Lock):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = lock
+
+    def observe(self, value: float) -> None:
+        # bisect_left puts a value equal to a bound in that bucket, matching Prometheus "le"
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class HistogramFamily:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        # Mongo command timings are observed from Motor's executor threads, requests from the event loop
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = Histogram(self.buckets, self._lock)
+        return child
+
+    def samples(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(values), list(child.counts), child.sum] for values, child in self._children.items()]
+
+
+class GaugeFamily:
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def dec(self, values: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) - amount
+
+    def set(self, values: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._values[values] = value
+
+    def samples(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(values), value] for values, value in self._values.items()]
+
+
+class MetricsRegistry:
+    """Process-local metric families rendered in the Prometheus text format.
+
+    With several workers each process writes its snapshot to a shared directory and
+    whichever worker is scraped merges them, so the totals cover the whole pod.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, Any] = {}
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]) -> HistogramFamily:
+        family = self._families[name] = HistogramFamily(name, documentation, label_names, buckets)
+        return family
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...]) -> GaugeFamily:
+        family = self._families[name] = GaugeFamily(name, documentation, label_names)
+        return family
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "families": {
+                name: {
+                    "kind": family.kind,
+                    "help": family.documentation,
+                    "labels": list(family.label_names),
+                    "buckets": list(getattr(family, "buckets", ())),
+                    "samples": family.samples(),
+                }
+                for name, family in self._families.items()
+            },
+        }
+
+    def write_snapshot(self, directory: str) -> None:
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        # Atomic rename so a concurrent scrape never reads a half-written file
+        os.replace(tmp_path, path)
+
+    def render(self, directory: Optional[str] = None) -> str:
+        snapshots = [self.snapshot()]
+        if directory:
+            snapshots.extend(_read_peer_snapshots(directory))
+        return _render(_merge(snapshots))
+
+
+async def metrics_flush_loop(directory: str, interval: float) -> None:
+    """Periodically publish this worker's snapshot for peers to merge at scrape time."""
+    os.makedirs(directory, exist_ok=True)
+    while True:
+        try:
+            registry.write_snapshot(directory)
+        except OSError as e:
+            logger.warning(f"Metrics snapshot write failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_peer_snapshots(directory: str) -> Iterable[Dict[str, Any]]:
+    own = f"metrics-{os.getpid()}.json"
+    for filename in os.listdir(directory):
+        if not filename.startswith("metrics-") or not filename.endswith(".json") or filename == own:
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not _pid_alive(snapshot.get("pid", 0)):
+            # Counters from a dead worker still count towards the totals; its gauges do not
+            for family in snapshot["families"].values():
+                if family["kind"] == "gauge":
+                    family["samples"] = []
+        yield snapshot
+
+
+def _merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot["families"].items():
+            target = merged.setdefault(name, {**family, "samples": {}})
+            for sample in family["samples"]:
+                key = tuple(sample[0])
+                if family["kind"] == "histogram":
+                    current = target["samples"].get(key)
+                    if current is None:
+                        target["samples"][key] = [list(sample[1]), sample[2]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], sample[1])]
+                        current[1] += sample[2]
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0) + sample[1]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: List[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _render(families: Dict[str, Dict[str, Any]]) -> str:
+    lines: List[str] = []
+    for name, family in families.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        names = family["labels"]
+        for values, sample in family["samples"].items():
+            if family["kind"] == "histogram":
+                counts, total = sample
+                cumulative = 0
+                for bound, count in zip(family["buckets"] + ["+Inf"], counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{name}_bucket{_label_text(names, values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(names, values)} {total}")
+                lines.append(f"{name}_count{_label_text(names, values)} {cumulative}")
+            else:
+                lines.append(f"{name}{_label_text(names, values)} {sample}")
+    return "\n".join(lines) + "\n"
+
+
+# Global registry and the HTTP families the middleware records into
+registry = MetricsRegistry()
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"), LATENCY_BUCKETS
+)
+request_size = registry.histogram(
+    "http_request_size_bytes", "Request body size", ("method", "route", "status"), SIZE_BUCKETS
+)
+response_size = registry.histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route", "status"), SIZE_BUCKETS
+)
+requests_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being served", ("method",))
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware; labels use the matched route template so path parameters don't explode cardinality."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_flight_key = (method,)
+        state = {"status": 500, "request_bytes": 0, "response_bytes": 0}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["request_bytes"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        requests_in_flight.inc(in_flight_key)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.dec(in_flight_key)
+            # FastAPI stores the matched APIRoute in the scope once routing has run
+            route = scope.get("route")
+            route_path = getattr(route, "path", "<unmatched>")
+            key = (method, route_path, str(state["status"]))
+            request_duration.labels(*key).observe(elapsed)
+            request_size.labels(*key).observe(state["request_bytes"])
+            response_size.labels(*key).observe(state["response_bytes"])
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import sys
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import monitoring
+from app.utils.metrics import LATENCY_BUCKETS, registry
+
+slow_query_logger = logging.getLogger("app.slow_queries")
+
+# Handshake and housekeeping commands that would only add noise to the stats
+IGNORED_COMMANDS = frozenset({
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "saslStart", "saslContinue",
+    "endSessions", "killCursors", "getnonce", "authenticate",
+})
+
+# Where the filter lives in each command; aggregate uses its leading $match
+FILTER_FIELDS = {"find": "filter", "count": "query", "findAndModify": "query", "distinct": "query"}
+
+command_duration = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command", "collection"), LATENCY_BUCKETS
+)
+
+# Motor runs PyMongo on executor threads; the issuing task is carried over through the copied context
+_caller_task: ContextVar[Optional[asyncio.Task]] = ContextVar("mongo_caller_task", default=None)
+
+
+async def bind_caller_task() -> None:
+    """Remember the running task so slow commands can be attributed to the service function awaiting them.
+
+    Async on purpose: as an app-wide dependency it then runs in the request's own task.
+    """
+    _caller_task.set(asyncio.current_task())
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Collect connection pool usage so workers can be sized against the pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(self.open_connections - 1, 0)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event.duration)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def _record_wait(self, duration) -> None:
+        # duration is reported in seconds by PyMongo
+        if duration is None:
+            return
+        wait_ms = duration * 1000
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "open_connections": self.open_connections,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_checkout_wait_ms": round(self.total_wait_ms / attempts, 3) if attempts else 0.0,
+                "max_checkout_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
+def _redact(value: Any) -> Any:
+    """Keep field names and operators, replace every literal with "?"."""
+    if isinstance(value, dict):
+        return {key: _redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Logical operators hold sub-filters; any other list is a value list such as $in
+        if value and all(isinstance(item, dict) for item in value):
+            return [_redact(item) for item in value]
+        return "?"
+    return "?"
+
+
+def _filter_shape(command_name: str, command: Dict[str, Any]) -> Any:
+    if command_name in FILTER_FIELDS:
+        return _redact(command.get(FILTER_FIELDS[command_name], {}))
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return _redact(pipeline[0].get("$match", {}))
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s") or [{}]
+        return _redact(statements[0].get("q", {}))
+    return None
+
+
+def _documents_returned(reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "value" in reply:
+        return 0 if reply["value"] is None else 1
+    return reply.get("n", 0)
+
+
+def _awaited_frames(coro: Any) -> List[Any]:
+    """Frames of a suspended coroutine chain, innermost first.
+
+    Suspended coroutine frames have no f_back, so the chain is followed through cr_await instead.
+    By the time a command reply arrives the issuing coroutine has long been suspended on it.
+    """
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames[::-1]
+
+
+def _service_caller() -> Optional[str]:
+    task = _caller_task.get()
+    if task is not None:
+        frames = _awaited_frames(task.get_coro())
+    else:
+        # Synchronous client: the caller is on this thread's own stack
+        frames = []
+        frame = sys._getframe(1)
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+    for frame in frames:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.") and not module.startswith(("app.utils", "app.database")):
+            return f"{module}.{frame.f_code.co_name}"
+    return None
+
+
+class CommandStatsListener(monitoring.CommandListener):
+    """Per-command, per-collection timings plus a slow-query log."""
+
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, Dict[str, Any]]] = {}
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else event.database_name
+        # Only a reference is kept; the filter shape is worked out when the command turns out slow
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (event.command_name, collection, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, event.reply, failed=False)
+
+    def failed(self, event):
+        self._finish(event, {}, failed=True)
+
+    def _finish(self, event, reply: Dict[str, Any], failed: bool) -> None:
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        command_name, collection, command = pending
+        duration_ms = event.duration_micros / 1000
+        documents = 0 if failed else _documents_returned(reply)
+
+        with self._lock:
+            stats = self._stats.setdefault((command_name, collection), {
+                "count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0, "documents": 0, "slow": 0,
+            })
+            stats["count"] += 1
+            stats["failures"] += failed
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["documents"] += documents
+            stats["slow"] += duration_ms >= self.slow_ms
+        command_duration.labels(command_name, collection).observe(duration_ms / 1000)
+
+        if duration_ms >= self.slow_ms:
+            slow_query_logger.warning(
+                f"🐢 Slow {command_name} on {collection}: {duration_ms:.1f}ms, {documents} docs, "
+                f"filter={_filter_shape(command_name, command)}, caller={_service_caller()}"
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+            return {
+                "slow_threshold_ms": self.slow_ms,
+                "commands": [
+                    {
+                        "command": command_name,
+                        "collection": collection,
+                        "count": int(stats["count"]),
+                        "failures": int(stats["failures"]),
+                        "slow": int(stats["slow"]),
+                        "avg_ms": round(stats["total_ms"] / stats["count"], 3),
+                        "max_ms": round(stats["max_ms"], 3),
+                        "documents": int(stats["documents"]),
+                    }
+                    for (command_name, collection), stats in items
+                ],
+            }
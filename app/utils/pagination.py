@@ -0,0 +1,31 @@
+import base64
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pymongo import ASCENDING
+from typing import Any, Dict, Tuple
+
+
+def encode_cursor(sort: str, value: Any, last_id: ObjectId) -> str:
+    """Opaque keyset cursor holding the sort name and the last (value, _id) pair of a page."""
+    payload = json_util.dumps({"s": sort, "v": value, "id": last_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, ObjectId]:
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value, last_id = payload["v"], payload["id"]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort or not isinstance(last_id, ObjectId):
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return value, last_id
+
+
+def keyset_condition(field: str, direction: int, value: Any, last_id: ObjectId) -> Dict[str, Any]:
+    """Filter resuming strictly after (value, last_id) in a (field, _id) sort."""
+    op = "$gt" if direction == ASCENDING else "$lt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: last_id}},
+    ]}
@@ -0,0 +1,79 @@
+import bisect
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class PrefixIndex:
+    """In-memory prefix lookup over a sorted key array, searched with bisect.
+
+    Every word position of a term is indexed, so "running shoe" is found by
+    typing "run" or "sho". Keys are lower-cased; the original text is returned.
+    Insertions stop once max_entries is reached so memory stays capped.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._keys: List[str] = []
+        self._values: List[Tuple[str, str, Optional[str]]] = []
+        self._seen: set = set()
+        self.dropped = 0
+
+    @staticmethod
+    def _suffixes(text: str) -> List[str]:
+        words = text.lower().split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _entries(self, text: str, kind: str, ref: Optional[str]):
+        value = (text, kind, ref)
+        if value in self._seen:
+            return []
+        return [(key, value) for key in self._suffixes(text)]
+
+    def build(self, items: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+        """Replace the index contents with (text, kind, ref) items in one sort."""
+        self._seen = set()
+        self.dropped = 0
+        entries = []
+        for text, kind, ref in items:
+            new = self._entries(text, kind, ref)
+            if len(entries) + len(new) > self.max_entries:
+                self.dropped += 1
+                continue
+            self._seen.add((text, kind, ref))
+            entries.extend(new)
+        entries.sort(key=lambda entry: entry[0])
+        self._keys = [key for key, _ in entries]
+        self._values = [value for _, value in entries]
+
+    def add(self, text: str, kind: str, ref: Optional[str] = None) -> bool:
+        new = self._entries(text, kind, ref)
+        if not new:
+            return True
+        if len(self._keys) + len(new) > self.max_entries:
+            self.dropped += 1
+            return False
+        self._seen.add((text, kind, ref))
+        for key, value in new:
+            position = bisect.bisect_right(self._keys, key)
+            self._keys.insert(position, key)
+            self._values.insert(position, value)
+        return True
+
+    def search(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, Optional[str]]]:
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        results: List[Tuple[str, str, Optional[str]]] = []
+        seen = set()
+        position = bisect.bisect_left(self._keys, prefix)
+        while position < len(self._keys) and self._keys[position].startswith(prefix):
+            value = self._values[position]
+            if value not in seen:
+                seen.add(value)
+                results.append(value)
+                if len(results) >= limit:
+                    break
+            position += 1
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {"terms": len(self._seen), "entries": len(self._keys), "max_entries": self.max_entries, "dropped": self.dropped}
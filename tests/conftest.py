@@ -0,0 +1,38 @@
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+@pytest.fixture
+def mock_db():
+    """In-memory database for plain CRUD paths (no sessions, $facet, $merge or $mergeObjects)."""
+    return AsyncMongoMockClient()["test"]
+
+
+@pytest.fixture
+def mongo_db():
+    """Factory for a throwaway database on a real server, for the paths mongomock cannot run.
+
+    Set MONGO_TEST_URI to a replica set member (transactions need one), e.g.
+    mongodb://localhost:27017/?replicaSet=rs0. Open it inside the test's event loop:
+    ``async with mongo_db() as db: ...``
+    """
+    uri = os.environ.get("MONGO_TEST_URI")
+    if not uri:
+        pytest.skip("MONGO_TEST_URI is not set")
+
+    @asynccontextmanager
+    async def connect():
+        client = AsyncIOMotorClient(uri)
+        db = client[f"test_{uuid.uuid4().hex[:12]}"]
+        try:
+            yield db
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    return connect
@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api_schemas.cart import CartItemCreate
+from app.indexes import INDEXES
+from app.services.cart_services import add_item_to_cart, build_cart_out, bulk_update_cart
+from app.services.product_services import product_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_product_cache():
+    product_cache.clear()
+    yield
+    product_cache.clear()
+
+
+async def _product(db, name="Mug", price=10.0, version=1):
+    product_id = ObjectId()
+    await db.products.insert_one({
+        "_id": product_id, "name": name, "description": None, "price": price,
+        "quantity": 10, "category": "kitchen", "image_url": None, "version": version,
+    })
+    return str(product_id)
+
+
+def test_add_rejects_bad_input_before_writing(mock_db):
+    async def scenario():
+        codes = []
+        for product_id, quantity in ((str(ObjectId()), 0), ("not-an-id", 1), (str(ObjectId()), 1)):
+            with pytest.raises(HTTPException) as error:
+                await add_item_to_cart(mock_db, "u1", product_id, quantity)
+            codes.append(error.value.status_code)
+        return codes, await mock_db.cart.count_documents({})
+
+    assert asyncio.run(scenario()) == ([400, 400, 404], 0)
+
+
+def test_add_creates_cart_and_merges_repeated_product(mongo_db):
+    # The merge is an update pipeline using $mergeObjects, which mongomock cannot run
+    async def scenario():
+        async with mongo_db() as db:
+            mug = await _product(db)
+            first = await add_item_to_cart(db, "u1", mug, 2)
+            await db.products.update_one({"_id": ObjectId(mug)}, {"$set": {"price": 12.0}, "$inc": {"version": 1}})
+            product_cache.clear()
+            second = await add_item_to_cart(db, "u1", mug, 3)
+            stored = await db.cart.find_one({"user_id": "u1"})
+            return first, second, stored
+
+    first, second, stored = asyncio.run(scenario())
+    assert [(item.quantity, item.price) for item in first.items] == [(2, 10.0)]
+    # One line, quantities added, snapshot refreshed from the newer product
+    assert [(item.quantity, item.price) for item in second.items] == [(5, 12.0)]
+    assert [(item["quantity"], item["product_version"]) for item in stored["items"]] == [(5, 2)]
+
+
+def test_add_appends_new_products_after_existing_lines(mongo_db):
+    async def scenario():
+        async with mongo_db() as db:
+            mug = await _product(db, "Mug")
+            pot = await _product(db, "Tea pot", 30.0)
+            await add_item_to_cart(db, "u1", mug, 1)
+            return await add_item_to_cart(db, "u1", pot, 1)
+
+    cart = asyncio.run(scenario())
+    assert [item.name for item in cart.items] == ["Mug", "Tea pot"]
+
+
+def test_concurrent_adds_to_a_new_cart_keep_every_quantity(mongo_db):
+    async def scenario():
+        async with mongo_db() as db:
+            await db.cart.create_indexes(INDEXES["cart"])
+            mug = await _product(db)
+            # Racing upserts hit user_cart_unique; the loser retries as a plain update
+            await asyncio.gather(*(add_item_to_cart(db, "u1", mug, 1) for _ in range(5)))
+            return await db.cart.find({"user_id": "u1"}).to_list(length=None)
+
+    carts = asyncio.run(scenario())
+    assert len(carts) == 1
+    assert [item["quantity"] for item in carts[0]["items"]] == [5]
+
+
+def test_bulk_add_merges_lines_and_reports_each_item(mongo_db):
+    async def scenario():
+        async with mongo_db() as db:
+            mug = await _product(db, "Mug")
+            pot = await _product(db, "Tea pot", 30.0)
+            await add_item_to_cart(db, "u1", mug, 1)
+            return await bulk_update_cart(db, "u1", [
+                CartItemCreate(product_id=mug, quantity=2),
+                CartItemCreate(product_id=pot, quantity=1),
+                CartItemCreate(product_id=pot, quantity=1),
+                CartItemCreate(product_id="bad", quantity=1),
+                CartItemCreate(product_id=str(ObjectId()), quantity=1),
+                CartItemCreate(product_id=mug, quantity=0),
+            ])
+
+    result = asyncio.run(scenario())
+    assert [item.status for item in result.results] == ["ok", "ok", "ok", "invalid_id", "not_found", "invalid_quantity"]
+    # Duplicate lines in the request are summed before the single merge write
+    assert [(item.name, item.quantity) for item in result.cart.items] == [("Mug", 3), ("Tea pot", 2)]
+
+
+def test_bulk_replace_overwrites_the_cart(mongo_db):
+    async def scenario():
+        async with mongo_db() as db:
+            mug = await _product(db, "Mug")
+            pot = await _product(db, "Tea pot", 30.0)
+            await add_item_to_cart(db, "u1", mug, 4)
+            return await bulk_update_cart(db, "u1", [CartItemCreate(product_id=pot, quantity=1)], replace=True)
+
+    result = asyncio.run(scenario())
+    assert [(item.name, item.quantity) for item in result.cart.items] == [("Tea pot", 1)]
+
+
+def test_fresh_snapshot_is_served_without_reading_products(mock_db):
+    async def scenario():
+        cart = {
+            "_id": ObjectId(), "user_id": "u1", "snapshot_checked_at": datetime.utcnow(),
+            "items": [{"product_id": str(ObjectId()), "quantity": 1, "name": "Mug", "unit_price": 10.0, "product_version": 1}],
+        }
+        # No product documents exist, so any refresh would drop the line
+        return await build_cart_out(mock_db, cart)
+
+    cart = asyncio.run(scenario())
+    assert [(item.name, item.price) for item in cart.items] == [("Mug", 10.0)]
+
+
+def test_stale_snapshot_refreshes_changed_lines_and_drops_deleted_products(mongo_db):
+    # The refresh is one bulk_write, which mongomock cannot run with PyMongo 4.13
+    async def scenario():
+        async with mongo_db() as db:
+            mug = await _product(db, "Mug")
+            pot = await _product(db, "Tea pot", 30.0)
+            gone = await _product(db, "Old kettle")
+            for product_id in (mug, pot, gone):
+                await add_item_to_cart(db, "u1", product_id, 1)
+            await db.products.update_one({"_id": ObjectId(pot)}, {"$set": {"name": "Teapot"}, "$inc": {"version": 1}})
+            await db.products.delete_one({"_id": ObjectId(gone)})
+            await db.cart.update_one({"user_id": "u1"}, {"$unset": {"snapshot_checked_at": ""}})
+            # A stale cached copy must not win over the newer version Mongo reports
+            cart = await build_cart_out(db, await db.cart.find_one({"user_id": "u1"}))
+            return cart, await db.cart.find_one({"user_id": "u1"})
+
+    cart, stored = asyncio.run(scenario())
+    assert [item.name for item in cart.items] == ["Mug", "Teapot"]
+    assert [item["name"] for item in stored["items"]] == ["Mug", "Teapot"]
+    assert stored["snapshot_checked_at"] is not None
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from app.config import settings
+from app.database import DatabaseManager
+
+
+def test_readiness_probe_gives_up_within_its_budget(monkeypatch):
+    # Nothing listens on port 1, so server selection can never succeed
+    monkeypatch.setattr(settings, "mongo_uri", "mongodb://127.0.0.1:1/?directConnection=true")
+    monkeypatch.setattr(settings, "database_name", "test")
+    monkeypatch.setattr(settings, "readiness_timeout_seconds", 0.2)
+    manager = DatabaseManager()
+
+    async def scenario():
+        assert manager.connect()
+        try:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(manager.ping(settings.readiness_timeout_seconds) for _ in range(5)))
+            return results, time.perf_counter() - started
+        finally:
+            manager.disconnect()
+
+    results, elapsed = asyncio.run(scenario())
+    assert results == [False] * 5
+    assert elapsed < 2
+    # The five probes shared one ping on the dedicated client
+    assert manager._probes.stats()["calls"] == 1
+    # The driver itself gives up on the budget, not just the awaiting coroutine
+    assert manager.probe_client.options.server_selection_timeout == 0.2
+    assert manager.probe_client.options.pool_options.max_pool_size == 1
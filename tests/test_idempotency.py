@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.idempotency_services import run_idempotent
+
+
+def test_completed_key_replays_stored_response(mock_db):
+    async def scenario():
+        db = mock_db
+        calls = []
+
+        async def place():
+            calls.append(1)
+            return {"order_id": "o1"}
+
+        first = await run_idempotent(db, "checkout:u1", "key-1", place)
+        second = await run_idempotent(db, "checkout:u1", "key-1", place)
+        record = await db.idempotency_keys.find_one({"_id": "checkout:u1:key-1"})
+        return calls, first, second, record
+
+    calls, first, second, record = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert first == second == {"order_id": "o1"}
+    assert record["status"] == "completed"
+
+
+def test_concurrent_duplicates_run_once(mock_db):
+    async def scenario():
+        db = mock_db
+        calls = []
+
+        async def place():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"order_id": "o1"}
+
+        results = await asyncio.gather(*(run_idempotent(db, "checkout:u1", "key-1", place) for _ in range(3)))
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"order_id": "o1"}] * 3
+
+
+def test_http_error_releases_key_for_retry(mock_db):
+    async def scenario():
+        db = mock_db
+
+        async def out_of_stock():
+            raise HTTPException(status_code=400, detail="Insufficient stock")
+
+        with pytest.raises(HTTPException):
+            await run_idempotent(db, "checkout:u1", "key-1", out_of_stock)
+        released = await db.idempotency_keys.find_one({"_id": "checkout:u1:key-1"})
+        retried = await run_idempotent(db, "checkout:u1", "key-1", lambda: asyncio.sleep(0, result={"order_id": "o2"}))
+        return released, retried
+
+    released, retried = asyncio.run(scenario())
+    assert released is None
+    assert retried == {"order_id": "o2"}
+
+
+def test_other_errors_keep_key_in_progress(mock_db):
+    async def scenario():
+        db = mock_db
+
+        async def driver_failure():
+            raise RuntimeError("connection reset after commit")
+
+        with pytest.raises(RuntimeError):
+            await run_idempotent(db, "checkout:u1", "key-1", driver_failure)
+        return await db.idempotency_keys.find_one({"_id": "checkout:u1:key-1"})
+
+    record = asyncio.run(scenario())
+    assert record["status"] == "in_progress"
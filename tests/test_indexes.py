@@ -0,0 +1,42 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from app.indexes import _definition
+
+
+def test_spec_matches_server_listing_with_float_directions():
+    model = IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_orders_date_idx")
+    listed = {"v": 2, "key": {"user_id": 1.0, "created_at": -1.0}, "name": "user_orders_date_idx"}
+    assert _definition(model.document) == _definition(listed)
+
+
+def test_compound_key_order_matters():
+    spec = IndexModel([("a", ASCENDING), ("b", ASCENDING)], name="ab").document
+    swapped = {"key": {"b": 1, "a": 1}, "name": "ab"}
+    assert _definition(spec) != _definition(swapped)
+
+
+def test_text_index_matches_its_fts_listing():
+    model = IndexModel([("name", TEXT), ("description", TEXT)], name="search_text")
+    listed = {
+        "key": {"_fts": "text", "_ftsx": 1},
+        "name": "search_text",
+        "weights": {"description": 1, "name": 1},
+        "textIndexVersion": 3,
+    }
+    assert _definition(model.document) == _definition(listed)
+
+
+def test_zero_ttl_is_compared():
+    model = IndexModel("expires_at", expireAfterSeconds=0, name="session_ttl")
+    plain = {"key": {"expires_at": 1}, "name": "session_ttl"}
+    assert _definition(model.document) == {"key": [["expires_at", 1]], "expireAfterSeconds": 0}
+    assert _definition(model.document) != _definition(plain)
+
+
+def test_unique_and_partial_filter_are_compared():
+    model = IndexModel("email", unique=True, name="email_unique")
+    assert _definition(model.document) != _definition({"key": {"email": 1}, "name": "email_unique"})
+
+    partial = IndexModel("finished_at", partialFilterExpression={"status": "done"}, name="done")
+    listed = {"key": {"finished_at": 1}, "name": "done", "partialFilterExpression": {"status": "done"}}
+    assert _definition(partial.document) == _definition(listed)
@@ -0,0 +1,52 @@
+import json
+import os
+
+from app.utils.metrics import MetricsRegistry
+
+
+def _registry():
+    registry = MetricsRegistry()
+    latency = registry.histogram("request_seconds", "Request latency", ("route",), (0.1, 1.0))
+    in_flight = registry.gauge("in_flight", "Requests in flight", ("method",))
+    return registry, latency, in_flight
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry, latency, _ = _registry()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.labels("/items/{item_id}").observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP request_seconds Request latency", "# TYPE request_seconds histogram"]
+    assert 'request_seconds_bucket{route="/items/{item_id}",le="0.1"} 2' in lines
+    assert 'request_seconds_bucket{route="/items/{item_id}",le="1.0"} 3' in lines
+    assert 'request_seconds_bucket{route="/items/{item_id}",le="+Inf"} 4' in lines
+    assert 'request_seconds_sum{route="/items/{item_id}"} 3.65' in lines
+    assert 'request_seconds_count{route="/items/{item_id}"} 4' in lines
+
+
+def test_gauge_and_label_escaping():
+    registry, _, in_flight = _registry()
+    in_flight.inc(('GE"T',))
+    in_flight.inc(('GE"T',))
+    in_flight.dec(('GE"T',))
+    assert 'in_flight{method="GE\\"T"} 1' in registry.render().splitlines()
+
+
+def test_peer_snapshots_are_merged(tmp_path):
+    registry, latency, in_flight = _registry()
+    latency.labels("/a").observe(0.5)
+    in_flight.set(("GET",), 2)
+
+    peer, peer_latency, peer_in_flight = _registry()
+    peer_latency.labels("/a").observe(0.05)
+    peer_in_flight.set(("GET",), 3)
+    snapshot = peer.snapshot()
+    # Pretend the peer is another live worker (this process's own pid is skipped)
+    snapshot["pid"] = os.getppid()
+    (tmp_path / "metrics-peer.json").write_text(json.dumps(snapshot))
+
+    lines = registry.render(str(tmp_path)).splitlines()
+    assert 'request_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'request_seconds_count{route="/a"} 2' in lines
+    assert 'in_flight{method="GET"} 5' in lines
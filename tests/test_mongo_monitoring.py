@@ -0,0 +1,17 @@
+from app.utils.mongo_monitoring import _filter_shape, _redact
+
+
+def test_redact_keeps_shape_and_hides_literals():
+    query = {"user_id": "abc", "created_at": {"$gte": 5, "$lt": 9}, "status": {"$in": ["paid", "shipped"]}}
+    assert _redact(query) == {"user_id": "?", "created_at": {"$gte": "?", "$lt": "?"}, "status": {"$in": "?"}}
+
+
+def test_redact_descends_into_logical_operators():
+    query = {"$or": [{"price": {"$gt": 1}}, {"price": 1, "_id": {"$gt": 2}}]}
+    assert _redact(query) == {"$or": [{"price": {"$gt": "?"}}, {"price": "?", "_id": {"$gt": "?"}}]}
+
+
+def test_filter_shape_per_command():
+    assert _filter_shape("aggregate", {"pipeline": [{"$match": {"day": "2024-01-01"}}, {"$group": {}}]}) == {"day": "?"}
+    assert _filter_shape("update", {"updates": [{"q": {"_id": 1}, "u": {}}]}) == {"_id": "?"}
+    assert _filter_shape("ping", {"ping": 1}) is None
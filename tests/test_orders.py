@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.services import order_services
+from app.services.job_services import job_queue
+from app.services.order_services import place_order
+
+
+async def _seed(db, stock=5, quantity=2, price=10.0):
+    product_id = ObjectId()
+    await db.products.insert_one({"_id": product_id, "name": "Mug", "price": price, "quantity": stock, "category": "kitchen"})
+    await db.cart.insert_one({
+        "user_id": "u1",
+        "items": [{"product_id": str(product_id), "quantity": quantity, "unit_price": price}],
+    })
+    return product_id
+
+
+def _enqueued():
+    return job_queue.stats.get("order.placed", {}).get("enqueued", 0)
+
+
+async def _state(db, product_id):
+    product = await db.products.find_one({"_id": product_id})
+    cart = await db.cart.find_one({"user_id": "u1"})
+    return {
+        "stock": product["quantity"],
+        "cart_items": len(cart["items"]),
+        "orders": await db.orders.count_documents({}),
+        "order_items": await db.order_items.count_documents({}),
+        "jobs": await db.jobs.count_documents({"type": "order.placed"}),
+    }
+
+
+@pytest.fixture
+def compensating(monkeypatch):
+    # mongomock has no sessions, so these run the path used on standalone servers
+    monkeypatch.setattr(order_services, "_transactions_supported", False)
+
+
+def test_compensating_checkout_places_order(mock_db, compensating):
+    async def scenario():
+        product_id = await _seed(mock_db)
+        order = await place_order(mock_db, "u1")
+        item = await mock_db.order_items.find_one({"order_id": ObjectId(order.id)})
+        return order, item, await _state(mock_db, product_id)
+
+    enqueued = _enqueued()
+    order, item, state = asyncio.run(scenario())
+    assert _enqueued() == enqueued + 1
+    assert order.total_price == 20.0
+    assert (item["quantity"], item["line_total"], item["category"]) == (2, 20.0, "kitchen")
+    assert state == {"stock": 3, "cart_items": 0, "orders": 1, "order_items": 1, "jobs": 1}
+
+
+def test_compensating_checkout_without_stock_changes_nothing(mock_db, compensating):
+    async def scenario():
+        product_id = await _seed(mock_db, stock=1)
+        with pytest.raises(HTTPException) as error:
+            await place_order(mock_db, "u1")
+        return error.value, await _state(mock_db, product_id)
+
+    error, state = asyncio.run(scenario())
+    assert error.status_code == 400
+    assert state == {"stock": 1, "cart_items": 1, "orders": 0, "order_items": 0, "jobs": 0}
+
+
+def test_concurrent_compensating_checkouts_of_one_cart_place_one_order(mongo_db, compensating):
+    # Real server: releasing a reservation goes through bulk_write, which mongomock cannot run
+    async def scenario():
+        async with mongo_db() as db:
+            product_id = await _seed(db)
+            results = await asyncio.gather(place_order(db, "u1"), place_order(db, "u1"), return_exceptions=True)
+            return results, await _state(db, product_id)
+
+    results, state = asyncio.run(scenario())
+    errors = [result for result in results if isinstance(result, HTTPException)]
+    assert len(errors) == 1 and errors[0].status_code in (400, 409)
+    # The losing checkout released its reservation and removed its order
+    assert state == {"stock": 3, "cart_items": 0, "orders": 1, "order_items": 1, "jobs": 1}
+
+
+def test_deleted_product_is_pulled_from_cart(mock_db, compensating):
+    async def scenario():
+        product_id = await _seed(mock_db)
+        await mock_db.products.delete_one({"_id": product_id})
+        with pytest.raises(HTTPException) as error:
+            await place_order(mock_db, "u1")
+        return error.value, await mock_db.cart.find_one({"user_id": "u1"})
+
+    error, cart = asyncio.run(scenario())
+    assert error.status_code == 409
+    assert cart["items"] == []
+
+
+def test_transactional_checkout_places_order(mongo_db, monkeypatch):
+    monkeypatch.setattr(order_services, "_transactions_supported", True)
+
+    enqueued = _enqueued()
+
+    async def scenario():
+        async with mongo_db() as db:
+            product_id = await _seed(db)
+            await place_order(db, "u1")
+            return await _state(db, product_id)
+
+    assert asyncio.run(scenario()) == {"stock": 3, "cart_items": 0, "orders": 1, "order_items": 1, "jobs": 1}
+    # Counted once, after the commit
+    assert _enqueued() == enqueued + 1
+
+
+def test_transactional_checkout_rolls_back_on_missing_stock(mongo_db, monkeypatch):
+    monkeypatch.setattr(order_services, "_transactions_supported", True)
+
+    async def scenario():
+        async with mongo_db() as db:
+            product_id = await _seed(db, stock=1)
+            with pytest.raises(HTTPException) as error:
+                await place_order(db, "u1")
+            return error.value, await _state(db, product_id)
+
+    enqueued = _enqueued()
+    error, state = asyncio.run(scenario())
+    assert error.status_code == 400
+    assert _enqueued() == enqueued
+    # The cart claim, the order and the job were all inside the aborted transaction
+    assert state == {"stock": 1, "cart_items": 1, "orders": 0, "order_items": 0, "jobs": 0}
+
+
+def test_concurrent_transactional_checkouts_of_one_cart_place_one_order(mongo_db, monkeypatch):
+    monkeypatch.setattr(order_services, "_transactions_supported", True)
+
+    async def scenario():
+        async with mongo_db() as db:
+            product_id = await _seed(db)
+            results = await asyncio.gather(place_order(db, "u1"), place_order(db, "u1"), return_exceptions=True)
+            return results, await _state(db, product_id)
+
+    results, state = asyncio.run(scenario())
+    # The loser either conflicts on the cart claim or finds the cart already empty
+    assert sum(isinstance(result, HTTPException) and result.status_code in (400, 409) for result in results) == 1
+    assert state == {"stock": 3, "cart_items": 0, "orders": 1, "order_items": 1, "jobs": 1}
@@ -0,0 +1,41 @@
+import base64
+
+import pytest
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_condition
+
+
+def test_cursor_round_trip():
+    last_id = ObjectId()
+    cursor = encode_cursor("price", 19.99, last_id)
+    assert decode_cursor(cursor, "price") == (19.99, last_id)
+
+
+def test_cursor_for_another_sort_is_rejected():
+    cursor = encode_cursor("price", 19.99, ObjectId())
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "created_at")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'{"s": "price"}').decode(),
+    base64.urlsafe_b64encode(json_util.dumps({"s": "price", "v": 1, "id": "abc"}).encode()).decode(),
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "price")
+    assert error.value.status_code == 400
+
+
+def test_keyset_condition_resumes_after_last_pair():
+    last_id = ObjectId()
+    assert keyset_condition("price", ASCENDING, 10, last_id) == {
+        "$or": [{"price": {"$gt": 10}}, {"price": 10, "_id": {"$gt": last_id}}]
+    }
+    assert keyset_condition("created_at", DESCENDING, 5, last_id)["$or"][0] == {"created_at": {"$lt": 5}}
@@ -0,0 +1,37 @@
+from app.utils.prefix_index import PrefixIndex
+
+
+def test_search_matches_any_word_case_insensitively():
+    index = PrefixIndex(max_entries=100)
+    index.build([("Running Shoe", "product", "1"), ("Rain Jacket", "product", "2"), ("Shoes", "category", None)])
+
+    assert index.search("run") == [("Running Shoe", "product", "1")]
+    assert index.search("SHO") == [("Running Shoe", "product", "1"), ("Shoes", "category", None)]
+    assert index.search("  running   sh ") == [("Running Shoe", "product", "1")]
+    assert index.search("") == []
+
+
+def test_search_respects_limit():
+    index = PrefixIndex(max_entries=100)
+    index.build([(f"item {i}", "product", str(i)) for i in range(5)])
+    assert len(index.search("item", limit=3)) == 3
+
+
+def test_add_keeps_keys_sorted_and_skips_duplicates():
+    index = PrefixIndex(max_entries=100)
+    index.build([("Blue Hat", "product", "1")])
+    assert index.add("Black Hat", "product", "2")
+    assert index.add("Black Hat", "product", "2")
+
+    assert index.search("b") == [("Black Hat", "product", "2"), ("Blue Hat", "product", "1")]
+    assert index.stats()["terms"] == 2
+
+
+def test_entries_are_capped():
+    index = PrefixIndex(max_entries=3)
+    index.build([("one two", "product", "1"), ("three four", "product", "2")])
+    assert index.stats() == {"terms": 1, "entries": 2, "max_entries": 3, "dropped": 1}
+
+    assert not index.add("five six", "product", "3")
+    assert index.search("five") == []
+    assert index.stats()["dropped"] == 2
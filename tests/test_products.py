@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.indexes import INDEXES
+from app.services import product_services
+from app.services.product_services import autocomplete_products, backfill_product_created_at, list_products, search_products
+from app.utils.prefix_index import PrefixIndex
+
+PRODUCTS = [
+    {"name": "Trail running shoe", "description": "Grippy shoe", "price": 80.0, "quantity": 3, "category": "shoes"},
+    {"name": "Road running shoe", "description": "Light shoe", "price": 120.0, "quantity": 3, "category": "shoes"},
+    {"name": "Running socks", "description": "Wool", "price": 12.0, "quantity": 9, "category": "apparel"},
+    {"name": "Rain jacket", "description": "Waterproof", "price": 90.0, "quantity": 1, "category": "apparel"},
+]
+
+
+async def _seed_catalog(db):
+    await db.products.create_indexes(INDEXES["products"])
+    await db.products.insert_many([dict(product) for product in PRODUCTS])
+
+
+def test_search_returns_page_total_and_facets(mongo_db):
+    # $text and $facet need a real server
+    async def scenario():
+        async with mongo_db() as db:
+            await _seed_catalog(db)
+            return await search_products(db, "running", page_size=2)
+
+    page = asyncio.run(scenario())
+    assert page.total == 3
+    assert len(page.items) == 2
+    assert {item.name for item in page.items} <= {"Trail running shoe", "Road running shoe", "Running socks"}
+    assert {(facet.category, facet.count) for facet in page.facets.categories} == {("shoes", 2), ("apparel", 1)}
+    assert [(bucket.min_price, bucket.max_price, bucket.count) for bucket in page.facets.price_buckets] == [
+        (10, 25, 1), (50, 100, 1), (100, 250, 1),
+    ]
+
+
+def test_category_filter_keeps_every_category_in_the_facet(mongo_db):
+    async def scenario():
+        async with mongo_db() as db:
+            await _seed_catalog(db)
+            return await search_products(db, "running", category="shoes", max_price=100)
+
+    page = asyncio.run(scenario())
+    assert [item.name for item in page.items] == ["Trail running shoe"]
+    assert page.total == 1
+    # The category facet ignores the category filter but still honours the price range
+    assert {(facet.category, facet.count) for facet in page.facets.categories} == {("shoes", 1), ("apparel", 1)}
+    assert [(bucket.min_price, bucket.count) for bucket in page.facets.price_buckets] == [(50, 1)]
+
+
+def test_autocomplete_picks_up_products_created_by_other_workers(mock_db, monkeypatch):
+    monkeypatch.setattr(product_services, "product_autocomplete", PrefixIndex(max_entries=1000))
+    monkeypatch.setattr(product_services, "_autocomplete_watermark", None)
+
+    async def scenario():
+        await mock_db.products.insert_one({"name": "Blue mug", "category": "kitchen", "created_at": datetime.utcnow()})
+        await product_services.build_autocomplete_index(mock_db)
+        before = autocomplete_products("tea")
+        # Inserted straight into Mongo, as another worker's create_product would
+        await mock_db.products.insert_one({"name": "Tea pot", "category": "kitchen", "created_at": datetime.utcnow()})
+        added = await product_services.refresh_autocomplete_index(mock_db)
+        return before, added, autocomplete_products("tea")
+
+    before, added, after = asyncio.run(scenario())
+    assert before == []
+    # The overlap window re-reads the mug too; re-adding it is a no-op
+    assert added == 2
+    assert [suggestion.text for suggestion in after] == ["Tea pot"]
+    assert [suggestion.text for suggestion in autocomplete_products("kit")] == ["kitchen"]
+
+
+async def _page_through(db, **filters):
+    names, cursor = [], None
+    while True:
+        page = await list_products(db, limit=2, cursor=cursor, **filters)
+        names.extend(item.name for item in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            return names
+
+
+def test_newest_listing_pages_through_a_category(mock_db):
+    async def scenario():
+        start = datetime(2024, 1, 1)
+        await mock_db.products.insert_many([
+            {"name": f"Mug {i}", "description": None, "price": 10.0, "quantity": 1, "category": "kitchen",
+             "image_url": None, "created_at": start + timedelta(days=i)}
+            for i in range(5)
+        ] + [{"name": "Spade", "description": None, "price": 20.0, "quantity": 1, "category": "garden",
+              "image_url": None, "created_at": start}])
+        return await _page_through(mock_db, category="kitchen")
+
+    assert asyncio.run(scenario()) == ["Mug 4", "Mug 3", "Mug 2", "Mug 1", "Mug 0"]
+
+
+def test_backfill_makes_legacy_products_reachable(mongo_db):
+    # The backfill is an update pipeline ($toDate), which mongomock cannot run
+    async def scenario():
+        async with mongo_db() as db:
+            await db.products.insert_one({"name": "Legacy mug", "description": None, "price": 5.0, "quantity": 1,
+                                          "category": "kitchen", "image_url": None})
+            await db.products.insert_many([
+                {"name": f"Mug {i}", "description": None, "price": 10.0, "quantity": 1, "category": "kitchen",
+                 "image_url": None, "created_at": datetime.utcnow() + timedelta(minutes=i)}
+                for i in range(3)
+            ])
+            backfilled = await backfill_product_created_at(db)
+            return backfilled, await _page_through(db), await backfill_product_created_at(db)
+
+    backfilled, names, again = asyncio.run(scenario())
+    assert (backfilled, again) == (1, 0)
+    assert names == ["Mug 2", "Mug 1", "Mug 0", "Legacy mug"]
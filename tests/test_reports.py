@@ -0,0 +1,90 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+from bson import ObjectId
+
+from app.config import settings
+from app.services.report_services import ROLLUP_STATE_ID, get_category_sales, get_daily_sales, run_sales_rollup
+
+
+@pytest.fixture
+def no_lag(monkeypatch):
+    monkeypatch.setattr(settings, "sales_rollup_lag_seconds", 0)
+
+
+async def _place(db, category, quantity, price):
+    now = datetime.utcnow()
+    order_id = ObjectId()
+    await db.orders.insert_one({"_id": order_id, "user_id": "u1", "total_price": quantity * price, "created_at": now})
+    await db.order_items.insert_one({
+        "order_id": order_id, "product_id": ObjectId(), "quantity": quantity,
+        "line_total": quantity * price, "category": category, "created_at": now,
+    })
+
+
+async def _totals(db):
+    daily = await db.sales_daily.find().to_list(length=None)
+    categories = await get_category_sales(db, None, None)
+    return (
+        sum(row["orders"] for row in daily),
+        sum(row["revenue"] for row in daily),
+        {row.category: (row.units, row.revenue) for row in categories},
+    )
+
+
+def test_get_daily_sales_filters_on_day_ids(mock_db):
+    async def scenario():
+        await mock_db.sales_daily.insert_many([
+            {"_id": day, "day": day, "orders": 1, "revenue": 5.0}
+            for day in ("2024-01-03", "2024-01-01", "2024-01-02")
+        ])
+        return await get_daily_sales(mock_db, date(2024, 1, 2), date(2024, 1, 3))
+
+    assert [row.day for row in asyncio.run(scenario())] == ["2024-01-02", "2024-01-03"]
+
+
+def test_each_run_adds_only_its_own_window(mongo_db, no_lag):
+    # $merge with a whenMatched pipeline needs a real server
+    async def scenario():
+        async with mongo_db() as db:
+            await _place(db, "kitchen", 2, 10.0)
+            await run_sales_rollup(db)
+            first = await _totals(db)
+            await _place(db, "kitchen", 1, 10.0)
+            await _place(db, "garden", 3, 5.0)
+            await run_sales_rollup(db)
+            return first, await _totals(db)
+
+    first, second = asyncio.run(scenario())
+    assert first == (1, 20.0, {"kitchen": (2, 20.0)})
+    assert second == (3, 45.0, {"kitchen": (3, 30.0), "garden": (3, 15.0)})
+
+
+def test_retried_window_is_not_counted_twice(mongo_db, no_lag):
+    async def scenario():
+        async with mongo_db() as db:
+            await _place(db, "kitchen", 2, 10.0)
+            await run_sales_rollup(db)
+            state = await db.rollup_state.find_one({"_id": ROLLUP_STATE_ID})
+            # As if the run had merged its window but died before advancing the watermark
+            await db.rollup_state.update_one(
+                {"_id": ROLLUP_STATE_ID},
+                {"$set": {"pending_until": state["watermark"]}, "$unset": {"watermark": ""}},
+            )
+            await run_sales_rollup(db)
+            return await _totals(db), await db.rollup_state.find_one({"_id": ROLLUP_STATE_ID})
+
+    totals, state = asyncio.run(scenario())
+    assert totals == (1, 20.0, {"kitchen": (2, 20.0)})
+    assert "pending_until" not in state
+
+
+def test_concurrent_runs_share_one_window(mongo_db, no_lag):
+    async def scenario():
+        async with mongo_db() as db:
+            await _place(db, "kitchen", 2, 10.0)
+            await asyncio.gather(run_sales_rollup(db), run_sales_rollup(db))
+            return await _totals(db)
+
+    assert asyncio.run(scenario()) == (1, 20.0, {"kitchen": (2, 20.0)})